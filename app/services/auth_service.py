@@ -1,17 +1,42 @@
 # app/services/auth_service.py - Authentication service (fixed version)
 import ssl
+import functools
 import hashlib
+import time
 import requests
 import urllib3
-import re
 from datetime import datetime
 from requests.adapters import HTTPAdapter
 from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
 from urllib3.util.ssl_ import create_urllib3_context
 from typing import Optional
 
 from app.config.settings import settings
 
+# Connections kept open per host - enough for the downloaders' concurrent workers; with
+# blocking on, a burst waits for a pooled keep-alive connection instead of opening throwaway ones
+POOL_MAXSIZE = 32
+POOL_BLOCK = True
+
+# Retries for dropped connections and 5xx replies, made inside the adapter on a pooled connection;
+# only idempotent reads are retried, and the last 5xx is returned for raise_for_status to report
+RETRY_POLICY = Retry(
+    total=5,
+    backoff_factor=0.3,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    raise_on_status=False
+)
+
+# Seconds a session is trusted after a login or liveness check before it is probed again
+SESSION_CHECK_INTERVAL = 300
+
+@functools.lru_cache(maxsize=1)
+def _password_md5(password: str) -> str:
+    """MD5 hex digest the login API expects - hashed once, reused by every re-login"""
+    return hashlib.md5(password.encode("utf-8")).hexdigest()
+
 class SSLAdapter(HTTPAdapter):
     """Custom SSL adapter with proper poolmanager initialization"""
     
@@ -36,17 +61,24 @@ class AuthenticationService:
     
     def __init__(self):
         self.session: Optional[requests.Session] = None
+        self._checked_at = 0.0  # time.monotonic() of the last login or liveness check
         # Disable SSL warnings
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
     
     def setup_authentication(self) -> requests.Session:
         """Main authentication method with session reuse"""
-        if self.session and self._is_session_valid():
-            print("♻️ Reusing existing valid session")
-            return self.session
+        if self.session:
+            # Recently checked sessions are reused as-is; callers invalidate on a 401
+            if time.monotonic() - self._checked_at < SESSION_CHECK_INTERVAL:
+                return self.session
+            if self._is_session_valid():
+                self._checked_at = time.monotonic()
+                print("♻️ Reusing existing valid session")
+                return self.session
         
         print("🔐 Performing authentication...")
         self.session = self._perform_authentication()
+        self._checked_at = time.monotonic()
         print("✅ Authentication successful!")
         return self.session
     
@@ -57,12 +89,16 @@ class AuthenticationService:
             self._validate_settings()
             
             # Get MD5 password hash
-            pw_md5 = hashlib.md5(settings.API_PASS.encode("utf-8")).hexdigest()
+            pw_md5 = _password_md5(settings.API_PASS)
             
             # Create session with SSL adapter
             session = requests.Session()
             session.verify = False
-            session.mount("https://", SSLAdapter())
+            # One pooled adapter for both schemes - receipt data URLs may be plain http, and without
+            # it those downloads would get requests' default 10-connection pool and no retries
+            adapter = SSLAdapter(pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK, max_retries=RETRY_POLICY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
             
             # Set default timeout for all requests
             session.timeout = getattr(settings, 'REQUEST_TIMEOUT', 30)
@@ -116,19 +152,16 @@ class AuthenticationService:
             print(f"🔍 Response headers: {dict(resp.headers)}")
             print(f"🔍 Response content preview: {resp.text[:200]}")
             
-            # Extract JWT token from Set-Cookie header
-            set_cookie = resp.headers.get("Set-Cookie", "")
-            print(f"🔍 Set-Cookie header: {set_cookie}")
-            
-            jwt_match = re.search(r"jwt=([^;]+)", set_cookie)
-            jwt_token = None
+            # JWT token from the login response - requests has already parsed its Set-Cookie
+            # headers into resp.cookies and stored them in the session jar
+            jwt_cookie = next((cookie for cookie in resp.cookies if cookie.name == "jwt"), None)
+            jwt_token = jwt_cookie.value if jwt_cookie else None
             
-            if jwt_match:
-                jwt_token = jwt_match.group(1)
-                print(f"✅ JWT token found via regex: {jwt_token[:20]}...")
+            if jwt_token:
+                print(f"✅ JWT token found in login response cookies: {jwt_token[:20]}...")
             else:
                 # Try alternative cookie extraction methods
-                print("🔍 Regex failed, checking session cookies...")
+                print("🔍 No jwt cookie on the login response, checking session cookies...")
                 for cookie in session.cookies:
                     print(f"🔍 Found cookie: {cookie.name} = {cookie.value[:20]}...")
                     if cookie.name.lower() == 'jwt':
@@ -165,9 +198,11 @@ class AuthenticationService:
                         f"Headers: {list(resp.headers.keys())}"
                     )
             
-            # Set JWT cookie with proper domain
-            if jwt_token:
-                domain = getattr(settings, 'COOKIE_DOMAIN', '.superbrandmall.com')
+            # Set JWT cookie with proper domain - unless the login response already stored it there
+            domain = getattr(settings, 'COOKIE_DOMAIN', '.superbrandmall.com')
+            if jwt_cookie and jwt_cookie.domain == domain:
+                print(f"🍪 JWT token already in session cookies for domain: {domain}")
+            elif jwt_token:
                 session.cookies.set(
                     "jwt",
                     jwt_token,
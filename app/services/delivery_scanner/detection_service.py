@@ -1,52 +1,77 @@
 # app/services/delivery_scanner/detection_service.py - Delivery detection service
+import functools
 import re
 from typing import Tuple, List
 
+# The regex module (in requirements.txt) supports atomic groups, which keep the separator
+# runs from being re-tried on a failed match; fall back to re with plain groups.
+try:
+    import regex as _pattern_engine
+    ATOMIC_GROUPS = True
+except ImportError:
+    _pattern_engine = re
+    ATOMIC_GROUPS = False
+
+# Only 4 keywords to check - exactly like your original
+DELIVERY_KEYWORDS = ('美团', '京东', '饿了么', '配送')
+
+# Enhanced separator patterns for OCR variations - exactly like your original
+# Common OCR misreads: spaces, underscores, dashes, dots, commas, pipes, etc.
+SEPARATORS = r'[\s_\-\.\,\|\:\;\!\?\*\+\=\(\)\[\]\{\}\<\>\~\`\^\&\%\$\#\@]{0,5}'  # Max 5 separator characters
+# Realistic OCR noise between adjacent glyphs - tried first, the full set above only when this misses
+TIGHT_SEPARATORS = r'[\s_\-\.\|]{0,2}'
+
+# Characters _validate_match treats as OCR separators, as a deletion table for str.translate
+SEPARATOR_CHARS = ' _-.,:;!?*+=()[]{}<>~`^&%$#@|\\/'
+_DROP_SEPARATORS = str.maketrans('', '', SEPARATOR_CHARS)
+
+def _compile_keyword_pattern(keyword: str, separators: str):
+    """Compile char + separator + char + ... for one keyword"""
+    # Keyword characters are never separators, so an atomic separator run matches the same text
+    if ATOMIC_GROUPS:
+        separators = f'(?>{separators})'
+    pattern = separators.join(map(re.escape, keyword))
+    return _pattern_engine.compile(pattern, _pattern_engine.IGNORECASE | _pattern_engine.UNICODE)
+
+@functools.lru_cache(maxsize=64)
+def _build_keyword_patterns(keyword: str) -> tuple:
+    """Compile the tight and full separator-tolerant patterns for one keyword - once per keyword
+    
+    The old strict and embedded-text strategies only added boundary assertions around the full
+    pattern, so they could never find a match it misses; _validate_match supplies the precision.
+    """
+    return (_compile_keyword_pattern(keyword, TIGHT_SEPARATORS),
+            _compile_keyword_pattern(keyword, SEPARATORS))
+
+# Compiled once at import; any other keyword compiles on first use through the cache
+_KEYWORD_PATTERNS = {keyword: _build_keyword_patterns(keyword) for keyword in DELIVERY_KEYWORDS}
+
+# Distinct characters of each keyword, for the literal prefilter
+_KEYWORD_CHARS = {keyword: frozenset(keyword) for keyword in DELIVERY_KEYWORDS}
+
+# Every keyword plus its common single-separator OCR variants ('美 团', '京|东', ...),
+# matched together in one pass over the text
+_VARIANT_SEPARATORS = ('', ' ', '_', '-', '.', '|')
+_VARIANT_KEYWORDS = {sep.join(keyword): keyword for keyword in DELIVERY_KEYWORDS for sep in _VARIANT_SEPARATORS}
+_VARIANT_RE = re.compile('|'.join(map(re.escape, sorted(_VARIANT_KEYWORDS, key=len, reverse=True))))
+
 class DetectionService:
     """Handles delivery keyword detection - extracted from your detection functions"""
     
     def __init__(self):
-        # Only 4 keywords to check - exactly like your original
-        self.keywords = ['美团', '京东', '饿了么', '配送']
+        self.keywords = list(DELIVERY_KEYWORDS)
     
     def detect_spaced_keyword(self, text: str, keyword: str) -> Tuple[bool, str]:
         """Detect keyword with various separators - EXACT logic from your detect_spaced_keyword function"""
-        # Convert keyword to individual characters
-        chars = list(keyword)
-        
-        # Enhanced separator patterns for OCR variations - exactly like your original
-        # Common OCR misreads: spaces, underscores, dashes, dots, commas, pipes, etc.
-        separators = r'[\s_\-\.\,\|\:\;\!\?\*\+\=\(\)\[\]\{\}\<\>\~\`\^\&\%\$\#\@]{0,5}'  # Max 5 separator characters
-        
-        # Build pattern: char + separator + char + separator + ...
-        pattern = separators.join(chars)
+        patterns = _KEYWORD_PATTERNS.get(keyword) or _build_keyword_patterns(keyword)
         
-        # Multiple search strategies to catch different cases - exactly like your original
-        search_patterns = [
-            # Strategy 1: With word boundaries (strict)
-            f'(?:^|[\\s\\n\\r]){pattern}(?=[\\s\\n\\r]|$)',
-            
-            # Strategy 2: Looser boundaries (for embedded text)
-            f'(?<![\\u4e00-\\u9fff\\w]){pattern}(?![\\u4e00-\\u9fff\\w])',
-            
-            # Strategy 3: Very loose (just the pattern)
-            pattern
-        ]
-        
-        for search_pattern in search_patterns:
-            try:
-                # Search for pattern (case insensitive)
-                matches = re.findall(search_pattern, text, re.IGNORECASE | re.UNICODE)
-                
-                if matches:
-                    # Validate each match to avoid false positives
-                    for match in matches:
-                        if self._validate_match(match, keyword):
-                            return True, match
-                            
-            except re.error:
-                # If regex fails, try next pattern
-                continue
+        # Tight separators first; the full separator set only runs when that finds nothing valid
+        for search_pattern in patterns:
+            # Validate matches lazily, stopping at the first one that is not a false positive
+            for m in search_pattern.finditer(text):
+                match = m.group(0)
+                if self._validate_match(match, keyword):
+                    return True, match
         
         return False, ""
     
@@ -62,40 +87,35 @@ class DetectionService:
         if len(match_clean) > len(keyword) * 6:  # Max 6x original length
             return False
         
-        # Count different types of characters
-        keyword_chars = set(keyword)
-        separator_chars = set(' _-.,:;!?*+=()[]{}.<>~`^&%$#@|\\/')
-        
-        match_keyword_chars = [c for c in match_clean if c in keyword_chars]
-        match_separator_chars = [c for c in match_clean if c in separator_chars]
-        match_other_chars = [c for c in match_clean if c not in keyword_chars and c not in separator_chars]
-        
-        # Should contain all keyword characters
-        if len(set(match_keyword_chars)) < len(keyword_chars):
+        # Should contain all keyword characters - checked before counting, which it would short-circuit
+        keyword_chars = _KEYWORD_CHARS.get(keyword) or frozenset(keyword)
+        if not all(c in match_clean for c in keyword_chars):
             return False
         
+        # Count different types of characters - str.translate/count run in C, no per-char Python loop
+        non_separators = match_clean.translate(_DROP_SEPARATORS)
+        separator_count = len(match_clean) - len(non_separators)
+        other_count = len(non_separators) - sum(non_separators.count(c) for c in keyword_chars)
+        
         # Shouldn't have too many random characters
-        if len(match_other_chars) > len(keyword) // 2:  # Max half as many random chars as keyword length
+        if other_count > len(keyword) // 2:  # Max half as many random chars as keyword length
             return False
         
         # Separator to keyword ratio check
-        if len(match_separator_chars) > len(keyword) * 3:  # Max 3x separators
+        if separator_count > len(keyword) * 3:  # Max 3x separators
             return False
         
-        # Character order check - keyword characters should appear in correct order
-        keyword_positions = []
+        # Character order check - keyword characters should appear in correct order.
+        # Each keyword character takes the next unused occurrence of that character
+        # (duplicates like 么么 consume successive ones), which must lie after the previous one.
+        next_start = {}
+        last_pos = -1
         for kw_char in keyword:
-            pos = match_clean.find(kw_char)
-            if pos >= 0:
-                keyword_positions.append(pos)
-                # Remove found character to handle duplicates
-                match_clean = match_clean[:pos] + ' ' + match_clean[pos+1:]
-            else:
+            pos = match_clean.find(kw_char, next_start.get(kw_char, 0))
+            if pos <= last_pos:  # Missing (-1) or out of sequence
                 return False
-        
-        # Positions should be in ascending order (characters appear in sequence)
-        if keyword_positions != sorted(keyword_positions):
-            return False
+            next_start[kw_char] = pos + 1
+            last_pos = pos
         
         return True
     
@@ -104,15 +124,30 @@ class DetectionService:
         if not text:
             return False, []
         
+        # Method 1: Direct and simple spaced variants, all keywords in a single scan
+        variant_hits = {}
+        for m in _VARIANT_RE.finditer(text):
+            variant = m.group()
+            keyword = _VARIANT_KEYWORDS[variant]
+            if variant == keyword or keyword not in variant_hits:
+                variant_hits[keyword] = variant
+        
         found_keywords = []
         
         for keyword in self.keywords:
-            # Method 1: Direct match (fastest) - exactly like your original
-            if keyword in text:
+            variant = variant_hits.get(keyword)
+            if variant == keyword:
                 found_keywords.append(f"{keyword} (direct)")
                 continue
+            if variant is not None:
+                found_keywords.append(f"{keyword} (spaced: '{variant}')")
+                continue
             
-            # Method 2: Flexible spacing detection - exactly like your original
+            # Method 2: Flexible spacing detection - _validate_match needs every keyword
+            # character, so skip the regex scans when any of them is absent from the text
+            keyword_chars = _KEYWORD_CHARS.get(keyword) or frozenset(keyword)
+            if not all(c in text for c in keyword_chars):
+                continue
             found, match = self.detect_spaced_keyword(text, keyword)
             if found:
                 found_keywords.append(f"{keyword} (spaced: '{match.strip()}')")
@@ -1,10 +1,16 @@
 # app/services/delivery_scanner/file_service.py - Enhanced with dual directory monitoring
+import atexit
+import errno
+import mmap
+import os
+import re
 import sys
 from pathlib import Path
 import json
+import orjson
 import shutil
 from datetime import datetime
-from typing import List, Optional, Set, Tuple, Dict
+from typing import List, Optional, MutableSet, Tuple, Dict
 
 # Add project root to path for imports
 current_file = Path(__file__)  # file_service.py
@@ -17,6 +23,110 @@ sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
 
+# Identity of a source file version: (file name, mtime in ns, source type)
+FileKey = Tuple[str, int, str]
+
+# Characters read per chunk when streaming text receipts for keywords
+STREAM_CHUNK_CHARS = 4096
+
+# Text receipts at least this large are keyword-screened through mmap before being decoded
+MMAP_MIN_BYTES = mmap.PAGESIZE
+
+# Characters of a delivery-negative receipt returned in place of its full text
+SCREENED_PREVIEW_BYTES = 400
+
+_NON_SPACE_BYTE = re.compile(rb'\S')
+
+def screen_text_file(filepath: Path, keywords: List[str]) -> Optional[str]:
+    """Check a large text receipt's raw UTF-8 bytes for keywords without decoding it
+    
+    Detection needs every character of some keyword somewhere in the text, so when no keyword
+    passes that test the file is delivery-negative; a short preview is returned instead of
+    the text. None means the file is small or may match and has to be read in full.
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # mmap's `in` only tests single bytes - find() does the substring search
+            if any(all(mm.find(c.encode('utf-8')) != -1 for c in kw) for kw in keywords):
+                return None
+            # Start the preview at the first non-blank byte so blank files still read as empty
+            m = _NON_SPACE_BYTE.search(mm)
+            if not m:
+                return ""
+            return mm[m.start():m.start() + SCREENED_PREVIEW_BYTES].decode('utf-8', errors='ignore')
+
+def _loads_json(buf: bytes):
+    """Parse raw JSON bytes with orjson, falling back to stdlib json for inputs orjson rejects"""
+    try:
+        return orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        return json.loads(buf.decode('utf-8'))
+
+def read_text_file(filepath: Path, keywords: Optional[List[str]] = None) -> str:
+    """Read file and extract text content - supports both JSON and text files
+    
+    With keywords, large text files that cannot contain any of them come back as a preview only.
+    """
+    try:
+        # Read JSON files
+        if filepath.suffix.lower() == '.json':
+            with open(filepath, 'rb') as f:
+                data = _loads_json(f.read())
+                if isinstance(data, dict) and 'data' in data:
+                    return data['data']
+                elif isinstance(data, dict) and 'text' in data:
+                    return data['text']
+                elif isinstance(data, dict) and 'content' in data:
+                    return data['content']
+                return str(data)
+        
+        if keywords:
+            preview = screen_text_file(filepath, keywords)
+            if preview is not None:
+                return preview
+        
+        # Read text files with UTF-8
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    except Exception as e:
+        print(f"    ❌ Error reading file {filepath.name}: {e}")
+        return ""
+
+def read_text_until_keyword(filepath: Path, keywords: List[str]) -> Tuple[str, List[str]]:
+    """Read a text file in chunks, stopping at the first chunk containing a keyword verbatim
+    
+    Returns (text read so far, direct keyword hits). With no hit the whole file has been
+    read, so the caller can still run the separator-tolerant detection on it.
+    JSON files are structural and always parsed whole.
+    """
+    if filepath.suffix.lower() == '.json':
+        return read_text_file(filepath), []
+    
+    try:
+        preview = screen_text_file(filepath, keywords)
+        if preview is not None:
+            return preview, []
+        
+        overlap = max(map(len, keywords), default=1) - 1  # Keywords split across a chunk boundary
+        parts = []
+        tail = ""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_CHARS), ''):
+                parts.append(chunk)
+                window = tail + chunk
+                hits = [kw for kw in keywords if kw in window]
+                if hits:
+                    return ''.join(parts), [f"{kw} (direct)" for kw in hits]
+                tail = window[-overlap:] if overlap else ""
+        return ''.join(parts), []
+    
+    except Exception as e:
+        print(f"    ❌ Error reading file {filepath.name}: {e}")
+        return "", []
+
 class FileService:
     """Enhanced FileService with dual directory monitoring for delivery scanning"""
     
@@ -40,6 +150,8 @@ class FileService:
         
         # Track which directory each file came from
         self.file_source_map: Dict[str, str] = {}  # filename -> source_type
+        self._source_types = {self.primary_source_dir: "primary", self.secondary_source_dir: "secondary"}
+        self._log_fh = None  # Detection log, opened on first delivery
         
         self._setup_folders()
     
@@ -67,7 +179,7 @@ class FileService:
         except ValueError:
             return False
     
-    def scan_for_new_files(self, processed_files: Set[str]) -> List[Path]:
+    def scan_for_new_files(self, processed_files: MutableSet[FileKey]) -> List[Path]:
         """Enhanced scan for new files from BOTH directories with date detection"""
         new_files = []
         
@@ -94,7 +206,7 @@ class FileService:
         
         return new_files
     
-    def _scan_directory_with_dates(self, base_dir: Path, processed_files: Set[str], source_type: str) -> List[Path]:
+    def _scan_directory_with_dates(self, base_dir: Path, processed_files: MutableSet[FileKey], source_type: str) -> List[Path]:
         """Scan directory and its date subdirectories for new files"""
         new_files = []
         
@@ -108,53 +220,76 @@ class FileService:
             new_files.extend(files)
         
         # Check for other date folders
-        for item in base_dir.iterdir():
-            if item.is_dir() and item.name != self.today and self._is_date_folder(item.name):
-                files = self._scan_single_directory(item, processed_files, source_type)
-                if files:
-                    print(f"📅 Found {len(files)} files in {source_type} date folder: {item.name}")
-                    new_files.extend(files)
+        with os.scandir(base_dir) as entries:
+            for entry in entries:
+                if entry.name != self.today and entry.is_dir() and self._is_date_folder(entry.name):
+                    files = self._scan_single_directory(Path(entry.path), processed_files, source_type)
+                    if files:
+                        print(f"📅 Found {len(files)} files in {source_type} date folder: {entry.name}")
+                        new_files.extend(files)
         
         return new_files
     
-    def _scan_single_directory(self, directory: Path, processed_files: Set[str], source_type: str) -> List[Path]:
+    def _scan_single_directory(self, directory: Path, processed_files: MutableSet[FileKey], source_type: str) -> List[Path]:
         """Scan a single directory for new files"""
         new_files = []
         
-        for file_path in directory.iterdir():
-            if file_path.is_file():
-                file_key = f"{file_path.name}_{file_path.stat().st_mtime}_{source_type}"
-                
-                if file_key not in processed_files:
-                    new_files.append(file_path)
-                    processed_files.add(file_key)
-                    # Track which source this file came from
-                    self.file_source_map[file_path.name] = source_type
+        # DirEntry caches the type from the directory read, so only mtime needs a stat
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    file_key = (entry.name, entry.stat().st_mtime_ns, source_type)
+                    
+                    if file_key not in processed_files:
+                        new_files.append(Path(entry.path))
+                        processed_files.add(file_key)
+                        # Track which source this file came from
+                        self.file_source_map[entry.name] = source_type
         
         return new_files
     
-    def read_file(self, filepath: Path) -> str:
-        """Read file and extract text content - supports both JSON and text files"""
-        try:
-            # Read JSON files
-            if filepath.suffix.lower() == '.json':
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and 'data' in data:
-                        return data['data']
-                    elif isinstance(data, dict) and 'text' in data:
-                        return data['text']
-                    elif isinstance(data, dict) and 'content' in data:
-                        return data['content']
-                    return str(data)
+    def get_source_roots(self) -> List[Path]:
+        """Base source directories (date folders live below these)"""
+        return list(self._source_types)
+    
+    def accept_event_files(self, paths: List[Path], processed_files: MutableSet[FileKey]) -> List[Path]:
+        """Filter file-watcher paths down to new files inside a source date folder
+        
+        A new date folder itself is scanned whole - files written into it right after
+        creation can arrive before the watcher is watching it.
+        """
+        new_files = []
+        
+        for file_path in dict.fromkeys(paths):
+            folder_source = self._source_types.get(file_path.parent)
+            if folder_source is not None:
+                if self._is_date_folder(file_path.name) and file_path.is_dir():
+                    new_files.extend(self._scan_single_directory(file_path, processed_files, folder_source))
+                continue
             
-            # Read text files with UTF-8
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
-                
-        except Exception as e:
-            print(f"    ❌ Error reading file {filepath.name}: {e}")
-            return ""
+            source_type = self._source_types.get(file_path.parent.parent)
+            if source_type is None or not self._is_date_folder(file_path.parent.name):
+                continue
+            
+            try:
+                file_key = (file_path.name, file_path.stat().st_mtime_ns, source_type)
+            except FileNotFoundError:
+                continue  # Already moved out by an earlier event
+            
+            if file_key not in processed_files:
+                new_files.append(file_path)
+                processed_files.add(file_key)
+                self.file_source_map[file_path.name] = source_type
+        
+        return new_files
+    
+    def read_file(self, filepath: Path, keywords: Optional[List[str]] = None) -> str:
+        """Read file and extract text content - supports both JSON and text files"""
+        return read_text_file(filepath, keywords)
+    
+    def read_file_until_keyword(self, filepath: Path, keywords: List[str]) -> Tuple[str, List[str]]:
+        """Read a file, stopping text files at the first direct keyword hit - see read_text_until_keyword"""
+        return read_text_until_keyword(filepath, keywords)
     
     def move_to_delivery(self, file_path: Path) -> Tuple[bool, str]:
         """Move file to delivery folder and clean up source"""
@@ -168,11 +303,12 @@ class FileService:
                 suffix = file_path.suffix
                 target_file = self.today_delivery_dir / f"{stem}_delivery_{timestamp}{suffix}"
             
-            # Copy file first
-            shutil.copy2(str(file_path), str(target_file))
+            # Move file - a single rename when source and target share a volume
+            self._move_file(file_path, target_file)
+            print(f"    🗑️  Removed from source: {file_path.name}")
             
-            # Remove from original location and cleanup
-            self._cleanup_source_file(file_path)
+            # Clean up the same file in the other source
+            self._cleanup_other_source(file_path)
             
             return True, str(target_file)
         except Exception as e:
@@ -190,60 +326,84 @@ class FileService:
                 suffix = file_path.suffix
                 target_file = self.today_non_delivery_dir / f"{stem}_nondelivery_{timestamp}{suffix}"
             
-            # Copy file first
-            shutil.copy2(str(file_path), str(target_file))
+            # Move file - a single rename when source and target share a volume
+            self._move_file(file_path, target_file)
+            print(f"    🗑️  Removed from source: {file_path.name}")
             
-            # Remove from original location and cleanup
-            self._cleanup_source_file(file_path)
+            # Clean up the same file in the other source
+            self._cleanup_other_source(file_path)
             
             return True, str(target_file)
         except Exception as e:
             return False, f"Error moving to non-delivery folder: {e}"
     
-    def _cleanup_source_file(self, file_path: Path):
-        """Remove file from source directory after processing"""
+    def _move_file(self, file_path: Path, target_file: Path):
+        """Rename into place, falling back to copy-and-delete across volumes"""
         try:
-            if file_path.exists():
-                file_path.unlink()
-                print(f"    🗑️  Removed from source: {file_path.name}")
-                
-                # Also check if there's a corresponding file in the other source
-                source_type = self.file_source_map.get(file_path.name)
-                if source_type == "primary":
-                    # Check secondary source for same file
-                    secondary_file = self.today_secondary_source / file_path.name
-                    if secondary_file.exists():
-                        secondary_file.unlink()
-                        print(f"    🗑️  Also removed from secondary source: {file_path.name}")
-                elif source_type == "secondary":
-                    # Check primary source for same file
-                    primary_file = self.today_primary_source / file_path.name
-                    if primary_file.exists():
-                        primary_file.unlink()
-                        print(f"    🗑️  Also removed from primary source: {file_path.name}")
-                        
+            os.replace(file_path, target_file)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(file_path), str(target_file))
+    
+    def _cleanup_other_source(self, file_path: Path):
+        """Remove a same-named file from the other source directory after processing"""
+        try:
+            source_type = self.file_source_map.get(file_path.name)
+            if source_type == "primary":
+                # Check secondary source for same file
+                secondary_file = self.today_secondary_source / file_path.name
+                if secondary_file.exists():
+                    secondary_file.unlink()
+                    print(f"    🗑️  Also removed from secondary source: {file_path.name}")
+            elif source_type == "secondary":
+                # Check primary source for same file
+                primary_file = self.today_primary_source / file_path.name
+                if primary_file.exists():
+                    primary_file.unlink()
+                    print(f"    🗑️  Also removed from primary source: {file_path.name}")
+                    
         except Exception as e:
             print(f"    ⚠️  Could not remove source file {file_path.name}: {e}")
     
     def log_delivery_detection(self, filename: str, keywords: List[str], text_preview: str, source_type: str = None):
         """Log delivery detection details with enhanced source information"""
-        log_file = self.today_delivery_dir / "delivery_detection_log.txt"
-        
         try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*50}\n")
-                f.write(f"Detection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"File: {filename}\n")
-                if source_type:
-                    source_name = "receipt_checked" if source_type == "primary" else "receipt_ocr_text"
-                    f.write(f"Source Directory: {source_name}\n")
-                f.write(f"Keywords Found: {', '.join(keywords)}\n")
-                f.write(f"Text Preview: {text_preview[:200]}...\n")
-                f.write(f"{'='*50}\n")
+            # Opened once per session; the whole entry goes out in a single buffered write
+            if self._log_fh is None:
+                self._log_fh = open(self.today_delivery_dir / "delivery_detection_log.txt", 'a',
+                                    encoding='utf-8', buffering=1 << 16)
+                atexit.register(self.close_log)
+            
+            source_line = ""
+            if source_type:
+                source_name = "receipt_checked" if source_type == "primary" else "receipt_ocr_text"
+                source_line = f"Source Directory: {source_name}\n"
+            
+            self._log_fh.write(
+                f"\n{'='*50}\n"
+                f"Detection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"File: {filename}\n"
+                f"{source_line}"
+                f"Keywords Found: {', '.join(keywords)}\n"
+                f"Text Preview: {text_preview[:200]}...\n"
+                f"{'='*50}\n"
+            )
                 
         except Exception as e:
             print(f"    ⚠️ Could not write to log file: {e}")
     
+    def flush_log(self):
+        """Push buffered detection log entries to disk"""
+        if self._log_fh is not None:
+            self._log_fh.flush()
+    
+    def close_log(self):
+        """Flush and close the detection log"""
+        if self._log_fh is not None:
+            self._log_fh.close()
+            self._log_fh = None
+    
     def get_all_files_in_sources(self) -> List[Path]:
         """Get all files from BOTH source directories"""
         all_files = []
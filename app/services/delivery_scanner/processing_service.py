@@ -1,7 +1,12 @@
 # app/services/delivery_scanner/processing_service.py - Backward compatible processing service
+import atexit
+import itertools
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Set, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 # Add project root to path for imports
@@ -13,12 +18,40 @@ project_root = app_dir.parent
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(app_dir))
 
+from app.services.delivery_scanner.file_service import read_text_until_keyword
+from app.utils.processed_keys import ProcessedFileKeys
+
+# Batches at least this large are read and classified in worker processes
+PARALLEL_MIN_FILES = 8
+
+def _classify_file(file_path: Path, detection_service) -> Optional[Tuple[str, bool, bool, List[str]]]:
+    """Read and keyword-check one file in a worker process - moves, logging and stats stay in the parent
+    
+    Returns (text preview, has text, is delivery, keywords), or None to have the parent retry it.
+    """
+    try:
+        text, found_keywords = read_text_until_keyword(file_path, detection_service.get_keywords())
+        has_text = bool(text.strip())
+        is_delivery = bool(found_keywords)
+        if has_text and not is_delivery:
+            is_delivery, found_keywords = detection_service.check_delivery_keywords(text)
+        return text[:100], has_text, is_delivery, found_keywords
+    except Exception:
+        return None
+
+def _write_lines(lines: List[str]):
+    """Emit the collected output lines with a single stdout write"""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        lines.clear()
+
 class ProcessingService:
     """Backward compatible processing service that works with both single and dual directory setups"""
     
     def __init__(self):
         # Session tracking (no persistent files)
-        self.processed_files: Set[str] = set()
+        # Processed files leave the source folders, so forgotten keys are never needed again
+        self.processed_files = ProcessedFileKeys(max_size=200_000)
         self.session_stats = {
             'total_processed': 0,
             'delivery_found': 0,
@@ -27,8 +60,10 @@ class ProcessingService:
             'secondary_source_processed': 0,
             'session_start': datetime.now()
         }
+        self._pool = None  # Classification worker processes, started on the first large batch
+        atexit.register(self.close)  # Once - stops whichever pool is current at exit
     
-    def get_processed_files(self) -> Set[str]:
+    def get_processed_files(self) -> 'ProcessedFileKeys':
         """Get set of processed files"""
         return self.processed_files
     
@@ -39,19 +74,69 @@ class ProcessingService:
         
         print(f"📊 Processing {len(new_files)} new files...")
         
+        # Reading and keyword detection run in parallel for large batches; moves stay here
+        if len(new_files) >= PARALLEL_MIN_FILES:
+            results = self._classify_in_workers(new_files, detection_service)
+        else:
+            results = itertools.repeat(None)
+        
         # Process in batches of 20 for better performance
         batch_size = 20
         for i in range(0, len(new_files), batch_size):
             batch = new_files[i:i + batch_size]
             print(f"📦 Processing batch {i//batch_size + 1}: {len(batch)} files")
             
-            for file_path in batch:
-                self._process_single_file(file_path, file_service, detection_service)
+            for file_path, classified in zip(batch, results):
+                self._process_single_file(file_path, file_service, detection_service, classified)
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the classification worker processes once per session"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return self._pool
+    
+    def close(self):
+        """Stop the classification worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def _classify_in_workers(self, new_files: List[Path], detection_service):
+        """Yield each file's worker result in order - None for the rest if a worker process dies"""
+        try:
+            yield from self._get_pool().map(_classify_file, new_files, itertools.repeat(detection_service),
+                                            chunksize=16)
+        except BrokenProcessPool:
+            print("    ⚠️  Classification worker crashed - reading the remaining files here")
+            self._pool.shutdown(wait=False)
+            self._pool = None  # A fresh pool is started for the next large batch
+            yield from itertools.repeat(None)
+    
+    def _read_and_detect(self, file_path: Path, file_service, detection_service):
+        """Read a file and check it for delivery keywords - text files stop reading at the first direct hit"""
+        if hasattr(file_service, 'read_file_until_keyword'):
+            text, found_keywords = file_service.read_file_until_keyword(file_path, detection_service.get_keywords())
+            if found_keywords:
+                return text, True, found_keywords
+        else:
+            text = file_service.read_file(file_path)
+        
+        # Check for delivery keywords using the correct method name
+        if not text.strip():
+            return text, False, []
+        is_delivery, found_keywords = detection_service.check_delivery_keywords(text)
+        return text, is_delivery, found_keywords
     
-    def _process_single_file(self, file_path: Path, file_service, detection_service):
-        """Process a single file with backward compatibility"""
+    def _process_single_file(self, file_path: Path, file_service, detection_service, classified=None):
+        """Process a single file with backward compatibility
+        
+        classified carries a worker process's _classify_file result; without it the file is read here.
+        Output lines are collected and written together - flushed before file service calls,
+        which print their own messages, so the order on the console is unchanged.
+        """
+        out = []
         try:
-            print(f"    🔍 Scanning: {file_path.name}")
+            out.append(f"    🔍 Scanning: {file_path.name}")
             
             # Check if file_service has dual directory support
             has_dual_support = hasattr(file_service, 'file_source_map')
@@ -59,35 +144,36 @@ class ProcessingService:
             if has_dual_support:
                 # Enhanced mode with dual directory support
                 source_type = file_service.file_source_map.get(file_path.name, "unknown")
-                print(f"       📍 Source: {source_type} directory")
+                out.append(f"       📍 Source: {source_type} directory")
             else:
                 # Single directory mode
                 source_type = "single"
             
-            # Read file content
-            text = file_service.read_file(file_path)
-            if not text.strip():
-                print(f"    ⚠️  Empty or unreadable file: {file_path.name}")
+            # Read file content and check for delivery keywords
+            if classified is None:
+                text, is_delivery, found_keywords = self._read_and_detect(file_path, file_service, detection_service)
+                classified = text[:100], bool(text.strip()), is_delivery, found_keywords
+            text_preview, has_text, is_delivery, found_keywords = classified
+            if not has_text:
+                out.append(f"    ⚠️  Empty or unreadable file: {file_path.name}")
                 return
             
-            # Check for delivery keywords using the correct method name
-            is_delivery, found_keywords = detection_service.check_delivery_keywords(text)
-            
             if is_delivery:
                 # This is a delivery receipt
-                print(f"    🚚 DELIVERY DETECTED: {file_path.name}")
+                out.append(f"    🚚 DELIVERY DETECTED: {file_path.name}")
                 if has_dual_support:
-                    print(f"       📍 Source: {source_type} directory")
-                print(f"       🔑 Keywords: {', '.join(found_keywords)}")
+                    out.append(f"       📍 Source: {source_type} directory")
+                out.append(f"       🔑 Keywords: {', '.join(found_keywords)}")
                 
                 # Move to delivery folder
+                _write_lines(out)
                 success, target_path = file_service.move_to_delivery(file_path)
                 if success:
-                    print(f"       ✅ Moved to: delivery_found/")
+                    out.append(f"       ✅ Moved to: delivery_found/")
                     
                     # Log the detection (check if enhanced logging is available)
-                    text_preview = text[:100] if len(text) > 100 else text
                     if hasattr(file_service, 'log_delivery_detection'):
+                        _write_lines(out)
                         # Check if the method accepts source_type parameter
                         try:
                             file_service.log_delivery_detection(
@@ -107,20 +193,21 @@ class ProcessingService:
                     # Update stats
                     self.session_stats['delivery_found'] += 1
                 else:
-                    print(f"       ❌ Move failed: {target_path}")
+                    out.append(f"       ❌ Move failed: {target_path}")
             else:
                 # Regular receipt (non-delivery)
-                print(f"    📋 Regular receipt: {file_path.name}")
+                out.append(f"    📋 Regular receipt: {file_path.name}")
                 if has_dual_support:
-                    print(f"       📍 Source: {source_type} directory")
+                    out.append(f"       📍 Source: {source_type} directory")
                 
                 # Move to non-delivery folder
+                _write_lines(out)
                 success, target_path = file_service.move_to_non_delivery(file_path)
                 if success:
-                    print(f"       ✅ Moved to: non_delivery/")
+                    out.append(f"       ✅ Moved to: non_delivery/")
                     self.session_stats['non_delivery_found'] += 1
                 else:
-                    print(f"       ❌ Move failed: {target_path}")
+                    out.append(f"       ❌ Move failed: {target_path}")
             
             # Update source-specific stats (only if dual directory support exists)
             if has_dual_support:
@@ -136,7 +223,9 @@ class ProcessingService:
             self.session_stats['total_processed'] += 1
             
         except Exception as e:
-            print(f"    ❌ Error processing {file_path.name}: {e}")
+            out.append(f"    ❌ Error processing {file_path.name}: {e}")
+        finally:
+            _write_lines(out)
     
     def scan_existing_files(self, file_service, detection_service) -> Dict[str, Any]:
         """Scan all existing files with backward compatibility"""
@@ -186,37 +275,38 @@ class ProcessingService:
         non_delivery_count = 0
         
         for i, file_path in enumerate(all_files, 1):
+            out = []  # This file's output lines - written before each file service call and at the end
             if has_dual_support:
                 source_type = file_service.file_source_map.get(file_path.name, "unknown")
-                print(f"🔍 [{i}/{len(all_files)}] Scanning: {file_path.name} ({source_type})")
+                out.append(f"🔍 [{i}/{len(all_files)}] Scanning: {file_path.name} ({source_type})")
             else:
                 source_type = "single"
-                print(f"🔍 [{i}/{len(all_files)}] Scanning: {file_path.name}")
+                out.append(f"🔍 [{i}/{len(all_files)}] Scanning: {file_path.name}")
             
             # Read and analyze file
-            text = file_service.read_file(file_path)
+            text, is_delivery, found_keywords = self._read_and_detect(file_path, file_service, detection_service)
             if not text.strip():
-                print(f"    ⚠️  Empty or unreadable file")
+                out.append(f"    ⚠️  Empty or unreadable file")
+                _write_lines(out)
                 continue
             
-            # Check for delivery keywords using the correct method name
-            is_delivery, found_keywords = detection_service.check_delivery_keywords(text)
-            
             if is_delivery:
                 # Delivery receipt
-                print(f"    🚚 DELIVERY DETECTED!")
+                out.append(f"    🚚 DELIVERY DETECTED!")
                 if has_dual_support:
-                    print(f"       📍 Source: {source_type} directory")
-                print(f"       🔑 Keywords: {', '.join(found_keywords)}")
+                    out.append(f"       📍 Source: {source_type} directory")
+                out.append(f"       🔑 Keywords: {', '.join(found_keywords)}")
                 
+                _write_lines(out)
                 success, target_path = file_service.move_to_delivery(file_path)
                 if success:
                     delivery_count += 1
-                    print(f"       ✅ Moved to delivery folder")
+                    out.append(f"       ✅ Moved to delivery folder")
                     
                     # Log detection with backward compatibility
                     text_preview = text[:100] if len(text) > 100 else text
                     if hasattr(file_service, 'log_delivery_detection'):
+                        _write_lines(out)
                         try:
                             file_service.log_delivery_detection(
                                 file_path.name, 
@@ -232,14 +322,17 @@ class ProcessingService:
                             )
             else:
                 # Regular receipt
-                print(f"    📋 Regular receipt")
+                out.append(f"    📋 Regular receipt")
                 if has_dual_support:
-                    print(f"       📍 Source: {source_type} directory")
+                    out.append(f"       📍 Source: {source_type} directory")
                 
+                _write_lines(out)
                 success, target_path = file_service.move_to_non_delivery(file_path)
                 if success:
                     non_delivery_count += 1
-                    print(f"       ✅ Moved to non-delivery folder")
+                    out.append(f"       ✅ Moved to non-delivery folder")
+            
+            _write_lines(out)
         
         # Update session stats
         self.session_stats.update({
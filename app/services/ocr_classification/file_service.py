@@ -1,5 +1,8 @@
 # app/services/ocr_classification/file_service.py - OCR classification file operations
 import sys
+import mmap
+import os
+import re
 from pathlib import Path
 import json
 import shutil
@@ -17,6 +20,15 @@ sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
 
+# Receipt URLs that mark a file for download - the host name is checked with a plain
+# substring search first, which settles the common no-URL case without the regex
+HDDC01_HOST = 'hddc01.superbrandmall.com'
+HDDC01_URL_RE = re.compile(r'https://hddc01\.superbrandmall\.com:443/[^\s<>"{}|\\^`\[\]]+')
+HDDC01_HOST_BYTES = HDDC01_HOST.encode('ascii')
+
+# Files at least this large are screened for the host name through mmap instead of being read in
+MMAP_MIN_BYTES = mmap.PAGESIZE
+
 class FileService:
     """Handles OCR classification file operations - extracted from your realtime_classifier.py"""
     
@@ -56,45 +68,47 @@ class FileService:
         
         new_files = []
         
-        # Get all files in today's source directory
-        for file_path in self.today_source_dir.iterdir():
-            if file_path.is_file():
-                file_key = f"{file_path.name}_{file_path.stat().st_mtime}"
-                
-                # Check if we've already processed this file
-                if file_key not in processed_files:
-                    new_files.append(file_path)
-                    processed_files.add(file_key)
+        # Get all files in today's source directory - scandir entries carry the file type,
+        # so only the stat for the mtime costs a syscall
+        with os.scandir(self.today_source_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    file_key = f"{entry.name}_{entry.stat().st_mtime}"
+                    
+                    # Check if we've already processed this file
+                    if file_key not in processed_files:
+                        new_files.append(Path(entry.path))
+                        processed_files.add(file_key)
+        
+        return new_files
+    
+    def accept_event_files(self, paths: List[Path], processed_files: set) -> List[Path]:
+        """Filter file-watcher paths down to new files in today's source directory"""
+        new_files = []
+        
+        for file_path in dict.fromkeys(paths):
+            if file_path.parent != self.today_source_dir:
+                continue
+            
+            try:
+                mtime = file_path.stat().st_mtime
+            except FileNotFoundError:
+                continue  # Gone before we got to it
+            
+            file_key = f"{file_path.name}_{mtime}"
+            if file_key not in processed_files:
+                new_files.append(file_path)
+                processed_files.add(file_key)
         
         return new_files
     
     def classify_single_file(self, file_path: Path) -> Tuple[bool, Optional[str], Optional[str]]:
         """Classify a single file - EXACT logic from your classify_single_file function"""
         try:
-            # Read file content
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            has_url = False
-            file_type = "unknown"
-            
-            # Try to parse as JSON first
-            try:
-                data = json.loads(content)
-                file_type = "json"
-                
-                # Extract the data field if it exists
-                if 'data' in data and data['data']:
-                    data_content = str(data['data'])
-                    has_url = self._contains_hddc01_url(data_content)
-                else:
-                    # If no data field, check entire JSON content
-                    has_url = self._contains_hddc01_url(content)
-                    
-            except json.JSONDecodeError:
-                # If not valid JSON, check raw content
-                file_type = "non-json"
-                has_url = self._contains_hddc01_url(content)
+            # Read file content - only when the raw bytes name the hddc01 host at all;
+            # the host name has nothing a JSON writer escapes, so a URL cannot hide from the byte search
+            content = self._read_if_hddc01(file_path)
+            has_url = content is not None and self._content_has_hddc01_url(content)
             
             # Determine destination and move file
             if has_url:
@@ -112,11 +126,44 @@ class FileService:
         except Exception as e:
             return False, None, str(e)
     
+    def _read_if_hddc01(self, file_path: Path) -> Optional[str]:
+        """Read a file's text if its raw bytes contain the hddc01 host name, otherwise None"""
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+                raw = f.read()
+                if HDDC01_HOST_BYTES not in raw:
+                    return None
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # mmap's `in` only tests single bytes - find() does the substring search
+                    if mm.find(HDDC01_HOST_BYTES) == -1:
+                        return None
+                    raw = mm[:]
+        return raw.decode('utf-8')
+    
+    def _content_has_hddc01_url(self, content: str) -> bool:
+        """Check a file's text for an hddc01 URL - in the data field of JSON files, else anywhere"""
+        # Try to parse as JSON first
+        try:
+            data = json.loads(content)
+            
+            # Extract the data field if it exists
+            if 'data' in data and data['data']:
+                data_content = str(data['data'])
+                return self._contains_hddc01_url(data_content)
+            else:
+                # If no data field, check entire JSON content
+                return self._contains_hddc01_url(content)
+                
+        except json.JSONDecodeError:
+            # If not valid JSON, check raw content
+            return self._contains_hddc01_url(content)
+    
     def _contains_hddc01_url(self, text: str) -> bool:
         """Check if text contains hddc01 URL - exact logic from your contains_hddc01_url"""
-        import re
-        hddc01_pattern = r'https://hddc01\.superbrandmall\.com:443/[^\s<>"{}|\\^`\[\]]+'
-        return bool(re.search(hddc01_pattern, text))
+        if HDDC01_HOST not in text:
+            return False
+        return HDDC01_URL_RE.search(text) is not None
     
     def get_all_files_in_source(self) -> List[Path]:
         """Get all files in today's source directory for manual classification"""
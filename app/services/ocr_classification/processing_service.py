@@ -1,14 +1,17 @@
 # app/services/ocr_classification/processing_service.py - OCR classification processing logic
 from datetime import datetime
-from typing import Set, Dict, Any, List
+from typing import Dict, Any, List
 from pathlib import Path
 
+from app.utils.processed_keys import ProcessedFileKeys
+
 class ProcessingService:
     """Handles OCR classification processing logic - extracted from your RealtimeFileClassifier class"""
     
     def __init__(self):
         # Exact same tracking as your original class
-        self.processed_files: Set[str] = set()  # Track files we've seen (session only)
+        # Classified files are moved out of the source folder, so forgotten keys are never needed again
+        self.processed_files = ProcessedFileKeys()  # Track files we've seen (session only)
         self.classification_stats = {
             "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_processed": 0,
@@ -119,7 +122,7 @@ class ProcessingService:
             "total": files_with_url + files_without_url + error_files
         }
     
-    def get_processed_files(self) -> Set[str]:
+    def get_processed_files(self) -> 'ProcessedFileKeys':
         """Get processed files set for file service"""
         return self.processed_files
     
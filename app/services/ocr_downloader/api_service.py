@@ -1,5 +1,7 @@
 # app/services/ocr_downloader/api_service.py - OCR downloader API service
+import logging
 import sys
+import threading
 from pathlib import Path
 from typing import Tuple, Optional
 import requests
@@ -14,17 +16,31 @@ sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
-from services.auth_service import AuthenticationService
+from services.auth_service import auth_service  # Use the singleton instance
 
 class APIService:
     """Handles file download API calls - extracted from your download_file_with_session function"""
     
     def __init__(self):
-        self.auth_service = AuthenticationService()
+        self.logger = logging.getLogger(f"{__name__}.APIService")
+        self.auth_service = auth_service  # One login shared by the monitor and --download-existing
+        self._session_lock = threading.Lock()  # Download threads share one login
+    
+    def _get_session(self) -> requests.Session:
+        """Get the authenticated session - one thread at a time, so an expired login is renewed once"""
+        with self._session_lock:
+            return self.auth_service.get_session()
+    
+    def _renew_session(self, rejected: requests.Session) -> requests.Session:
+        """Log in again after the server rejected a session - unless another thread already has"""
+        with self._session_lock:
+            if self.auth_service.session is rejected:
+                self.auth_service.invalidate_session()
+            return self.auth_service.get_session()
     
     def detect_content_type(self, url: str) -> str:
         """Detect content type using HEAD request - EXACT logic from your original"""
-        session = self.auth_service.get_session()
+        session = self._get_session()
         
         try:
             # Make a HEAD request to get content type
@@ -33,16 +49,22 @@ class APIService:
             return content_type
             
         except Exception as e:
-            print(f"    ⚠️ Could not detect file type: {e}, defaulting to image/jpeg")
+            self.logger.warning(f"    ⚠️ Could not detect file type: {e}, defaulting to image/jpeg")
             return 'image/jpeg'  # Default fallback
     
     def download_file_content(self, url: str) -> Tuple[Optional[requests.Response], Optional[str]]:
         """Download file content from URL - extracted from your download_file_with_session"""
-        session = self.auth_service.get_session()
+        session = self._get_session()
+        response = None
         
         try:
             # Download the actual file
             response = session.get(url, stream=True, timeout=30)
+            if response.status_code == 401:
+                # Login expired since the last check - log in again once and retry
+                response.close()
+                session = self._renew_session(session)
+                response = session.get(url, stream=True, timeout=30)
             response.raise_for_status()
             
             # Get content type from response
@@ -51,12 +73,14 @@ class APIService:
             return response, content_type
             
         except Exception as e:
-            print(f"    ❌ Download failed: {e}")
+            if response is not None:
+                response.close()  # Unread streamed body - give its connection back to the pool
+            self.logger.error(f"    ❌ Download failed: {e}")
             return None, None
     
     def test_url_accessibility(self, url: str) -> bool:
         """Test if URL is accessible"""
-        session = self.auth_service.get_session()
+        session = self._get_session()
         
         try:
             response = session.head(url, timeout=10)
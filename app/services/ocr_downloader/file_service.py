@@ -1,9 +1,13 @@
 # app/services/ocr_downloader/file_service.py - OCR downloader file operations
+import logging
+import mmap
+import os
 import sys
 from pathlib import Path
 import re
+import shutil
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse, unquote
 
 # Add project root to path for imports
@@ -17,10 +21,57 @@ sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
 
+# Identity of a source file version: (file name, size, mtime in ns)
+FileKey = Tuple[str, int, int]
+
+# Copy buffer when streaming a download to disk - the copy loop runs in C, one write per MiB
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Suffix of a download still being written - the file only gets its real name once complete
+PARTIAL_SUFFIX = ".part"
+
+# Leading bytes searched for a receipt URL before falling back to reading the whole file
+URL_SCAN_BYTES = 64 * 1024
+
+# Receipt URL patterns - the bytes forms run on the raw file so its body is never decoded,
+# the text forms only when a match strays outside ASCII
+DATA_URL_PATTERN = r'"data"\s*:\s*"(?P<url>https?://[^"]+)"'
+DIRECT_URL_PATTERN = r'https://hddc01\.superbrandmall\.com:443/[^\s<>"{}|\\^`\[\]]+'
+DATA_URL_RE = re.compile(DATA_URL_PATTERN)
+DIRECT_URL_RE = re.compile(DIRECT_URL_PATTERN)
+DATA_URL_BYTES_RE = re.compile(DATA_URL_PATTERN.encode('ascii'))
+DIRECT_URL_BYTES_RE = re.compile(DIRECT_URL_PATTERN.encode('ascii'))
+
+# Content types the downloads are saved under, and their file extensions
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tiff',
+    'image/webp': '.webp',
+    'application/pdf': '.pdf'
+}
+
+# URL suffixes that name a receipt's file type, with the Content-Type each one implies
+URL_SUFFIX_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tiff': 'image/tiff',
+    '.webp': 'image/webp',
+    '.pdf': 'application/pdf'
+}
+
 class FileService:
     """Handles OCR downloader file operations - extracted from your realtime_downloader.py"""
     
     def __init__(self):
+        self.logger = logging.getLogger(f"{__name__}.FileService")
+        
         # Base directories - ALL inside worker/data/
         self.source_dir = settings.WORKER_DIR / "data" / "receipt_ocring"     # worker/data/receipt_ocring/
         self.download_dir = settings.WORKER_DIR / "data" / "downloaded_receipts"  # worker/data/downloaded_receipts/
@@ -30,6 +81,11 @@ class FileService:
         self.today_source_dir = self.source_dir / self.today     # worker/data/receipt_ocring/2025-07-23/
         self.today_download_dir = self.download_dir / self.today # worker/data/downloaded_receipts/2025-07-23/
         
+        # Keys of files finished today, kept across restarts - worker/data/downloaded_receipts/.processed_2025-07-23.tsv
+        self.processed_log = self.download_dir / f".processed_{self.today}.tsv"
+        self._scan_keys: Dict[str, FileKey] = {}  # Latest scan's new files, until they are recorded
+        self.downloaded_names: Set[str] = set()  # Files in today's download folder - see load_downloaded_names
+        
         self._setup_folders()
     
     def _setup_folders(self):
@@ -44,72 +100,158 @@ class FileService:
         print(f"   📂 Source: {self.today_source_dir}")
         print(f"   💾 Downloads: {self.today_download_dir}")
     
-    def scan_for_new_files(self, processed_files: set) -> List[Path]:
+    def scan_for_new_files(self, processed_files: Set[FileKey]) -> List[Path]:
         """Scan source directory for new files - exact logic from your scan_for_new_files"""
         if not self.today_source_dir.exists():
             return []
         
         new_files = []
+        self._scan_keys.clear()
         
-        # Get all files in today's source directory
-        for file_path in self.today_source_dir.iterdir():
-            if file_path.is_file():
-                file_key = f"{file_path.name}_{file_path.stat().st_mtime}"
-                
-                # Check if we've already processed this file
-                if file_key not in processed_files:
-                    new_files.append(file_path)
-                    processed_files.add(file_key)
+        # Get all files in today's source directory - scandir entries carry the file type,
+        # so only the stat for the mtime costs a syscall
+        with os.scandir(self.today_source_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    file_key = (entry.name, st.st_size, st.st_mtime_ns)
+                    
+                    # Check if we've already processed this file
+                    if file_key not in processed_files:
+                        new_files.append(Path(entry.path))
+                        processed_files.add(file_key)
+                        self._scan_keys[entry.name] = file_key
         
         return new_files
     
+    def accept_event_files(self, paths: List[Path], processed_files: Set[FileKey]) -> List[Path]:
+        """Filter file-watcher paths down to new files in today's source directory"""
+        new_files = []
+        self._scan_keys.clear()
+        
+        for file_path in dict.fromkeys(paths):
+            if file_path.parent != self.today_source_dir:
+                continue
+            
+            try:
+                st = file_path.stat()
+            except FileNotFoundError:
+                continue  # Gone before we got to it
+            
+            file_key = (file_path.name, st.st_size, st.st_mtime_ns)
+            if file_key not in processed_files:
+                new_files.append(file_path)
+                processed_files.add(file_key)
+                self._scan_keys[file_path.name] = file_key
+        
+        return new_files
+    
+    def load_processed_files(self) -> Set[FileKey]:
+        """Load the keys of files earlier runs finished today"""
+        processed_files = set()
+        try:
+            with open(self.processed_log, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        name, size, mtime_ns = line.rstrip('\n').rsplit('\t', 2)
+                        processed_files.add((name, int(size), int(mtime_ns)))
+                    except ValueError:
+                        continue  # Line cut short by a crash mid-write
+        except FileNotFoundError:
+            pass
+        return processed_files
+    
+    def record_processed_files(self, file_paths: List[Path]):
+        """Append finished files from the latest scan to today's processed log - one durable write per batch"""
+        keys = [self._scan_keys[p.name] for p in file_paths if p.name in self._scan_keys]
+        if not keys:
+            return
+        
+        try:
+            with open(self.processed_log, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{name}\t{size}\t{mtime_ns}\n" for name, size, mtime_ns in keys))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not record processed files: {e}")
+    
+    def load_downloaded_names(self) -> int:
+        """List today's download folder once - existence checks then come from memory instead of a stat per file"""
+        self.downloaded_names = set()
+        with os.scandir(self.today_download_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(PARTIAL_SUFFIX):
+                    # Left by a run killed mid-download - never a finished file
+                    Path(entry.path).unlink(missing_ok=True)
+                else:
+                    self.downloaded_names.add(entry.name)
+        return len(self.downloaded_names)
+    
     def extract_url_from_file(self, file_path: Path) -> Optional[str]:
         """Extract URL from file - EXACT logic from your extract_url_from_file function"""
         try:
-            # Read file content
-            txt = file_path.read_bytes().decode("utf-8", errors="ignore")
-            
-            # Look for URL pattern in data field
-            m = re.search(r'"data"\s*:\s*"(?P<url>https?://[^"]+)"', txt)
-            if m:
-                return m.group("url")
-            
-            # Alternative pattern - direct URL search
-            m = re.search(r'https://hddc01\.superbrandmall\.com:443/[^\s<>"{}|\\^`\[\]]+', txt)
-            if m:
-                return m.group(0)
-            
-            return None
+            with open(file_path, 'rb') as f:
+                buf = f.read(URL_SCAN_BYTES)
+                
+                # The data field normally comes first - find it with a plain byte search and match it in place
+                idx = buf.find(b'"data"')
+                if idx != -1:
+                    m = DATA_URL_BYTES_RE.match(buf, idx)
+                    if m and m.group(0).isascii():
+                        return m.group("url").decode("ascii")
+                
+                # Otherwise search the whole file - larger ones through mmap instead of reading them in
+                if len(buf) == URL_SCAN_BYTES:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        return self._search_url(mm)
+            return self._search_url(buf)
             
         except Exception as e:
-            print(f"    ❌ Error reading file {file_path.name}: {e}")
+            self.logger.error(f"    ❌ Error reading file {file_path.name}: {e}")
             return None
     
+    def _search_url(self, data) -> Optional[str]:
+        """Search a file's raw bytes (or an mmap of them) for the receipt URL"""
+        # Look for URL pattern in data field, then the direct URL
+        m = DATA_URL_BYTES_RE.search(data) or DIRECT_URL_BYTES_RE.search(data)
+        if not m:
+            return None
+        
+        # An ASCII match reads the same as text; anything else goes through the decoded search,
+        # which drops invalid bytes and stops at Unicode whitespace
+        if m.group(0).isascii():
+            return (m.group("url") if m.re is DATA_URL_BYTES_RE else m.group(0)).decode("ascii")
+        
+        txt = data[:].decode("utf-8", errors="ignore")
+        
+        # Look for URL pattern in data field
+        m = DATA_URL_RE.search(txt)
+        if m:
+            return m.group("url")
+        
+        # Alternative pattern - direct URL search
+        m = DIRECT_URL_RE.search(txt)
+        if m:
+            return m.group(0)
+        
+        return None
+    
     def prepare_download_filename(self, source_filename: str, content_type: str, url: str) -> Tuple[str, Path]:
         """Prepare download filename - EXACT logic from your download_file_with_session function"""
         # Use the source filename as base filename
         base_name = Path(source_filename).stem  # Remove extension to get the base name
         
-        # Map content types to extensions - exactly like your original
-        extension_map = {
-            'image/jpeg': '.jpg',
-            'image/jpg': '.jpg', 
-            'image/png': '.png',
-            'image/gif': '.gif',
-            'image/bmp': '.bmp',
-            'image/tiff': '.tiff',
-            'image/webp': '.webp',
-            'application/pdf': '.pdf'
-        }
-        
-        # Get extension from content type
-        extension = extension_map.get(content_type.lower(), '')
+        # Get extension from content type - parameters such as "; charset=binary" are not part of the type
+        media_type = content_type.split(';', 1)[0].strip().lower()
+        extension = CONTENT_TYPE_EXTENSIONS.get(media_type, '')
         
         # If no extension from content type, try to get from URL
         if not extension:
             url_path = urlparse(unquote(url)).path
             url_extension = Path(url_path).suffix.lower()
-            if url_extension in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.pdf']:
+            if url_extension in URL_SUFFIX_CONTENT_TYPES:
                 extension = url_extension
             else:
                 # Default to .jpg for images - exactly like your original
@@ -121,27 +263,65 @@ class FileService:
         
         return filename, dest_path
     
+    def content_type_from_url(self, url: str) -> Optional[str]:
+        """Content type implied by a known file suffix on the URL path, or None"""
+        url_extension = Path(urlparse(unquote(url)).path).suffix.lower()
+        return URL_SUFFIX_CONTENT_TYPES.get(url_extension)
+    
     def file_already_exists(self, dest_path: Path) -> bool:
-        """Check if file already exists"""
-        return dest_path.exists()
+        """Check if file already exists - against the names loaded at startup plus those saved since"""
+        return dest_path.name in self.downloaded_names
     
     def save_downloaded_content(self, dest_path: Path, response) -> bool:
         """Save downloaded content to file"""
+        # Written under a hidden name and renamed into place once complete - the OCR processor
+        # never sees a half-written or preallocated file, and a failed download leaves nothing behind
+        part_path = dest_path.with_name(f".{dest_path.name}{PARTIAL_SUFFIX}")
         try:
-            with open(dest_path, "wb") as f:
-                for chunk in response.iter_content(8192):
-                    f.write(chunk)
+            # Read the socket directly; decode_content still undoes any gzip/deflate transfer encoding
+            response.raw.decode_content = True
+            with open(part_path, "wb") as f:
+                self._preallocate(f, response)
+                shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
+                f.truncate()  # Drop any reserved space the body did not fill
+            os.replace(part_path, dest_path)
+            self.downloaded_names.add(dest_path.name)
             return True
         except Exception as e:
-            print(f"    ❌ Error saving file: {e}")
+            self.logger.error(f"    ❌ Error saving file: {e}")
+            part_path.unlink(missing_ok=True)
             return False
+        finally:
+            response.close()  # A body cut off mid-copy would otherwise hold its pooled connection
+    
+    def _preallocate(self, f, response):
+        """Reserve the file's final size up front, so the filesystem can lay it out in one piece"""
+        # A compressed body's length says nothing about the decoded size
+        if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            return
+        
+        try:
+            size = int(response.headers.get('Content-Length') or 0)
+        except ValueError:
+            return
+        if size <= 0:
+            return
+        
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+        except OSError:
+            pass  # Filesystem without preallocation - the copy allocates as it writes
     
     def get_all_files_in_source(self) -> List[Path]:
         """Get all files in today's source directory for manual download"""
         if not self.today_source_dir.exists():
             return []
         
-        return [f for f in self.today_source_dir.iterdir() if f.is_file()]
+        with os.scandir(self.today_source_dir) as entries:
+            return [Path(entry.path) for entry in entries if entry.is_file()]
     
     def get_download_summary(self) -> dict:
         """Get summary of downloaded files"""
@@ -1,14 +1,23 @@
 # app/services/ocr_downloader/processing_service.py - OCR downloader processing logic
+import atexit
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Set, Dict, Any, List, Tuple, Optional
 from pathlib import Path
 
+# Files downloaded at once - downloads spend nearly all their time waiting on the network
+DOWNLOAD_WORKERS = 16
+
 class ProcessingService:
     """Handles OCR downloader processing logic - extracted from your RealtimeFileDownloader class"""
     
     def __init__(self):
+        self.logger = logging.getLogger(f"{__name__}.ProcessingService")
+        
         # Exact same tracking as your original class
-        self.processed_files: Set[str] = set()  # Track files we've processed (session only)
+        self.processed_files: Set[Tuple[str, int, int]] = set()  # (name, size, mtime_ns) of files we've processed
+        self._pool: Optional[ThreadPoolExecutor] = None
         self.download_stats = {
             "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_processed": 0,
@@ -23,65 +32,92 @@ class ProcessingService:
         if not files:
             return
         
-        print(f"\n🎯 Processing {len(files)} new files for download...")
+        self.logger.info(f"\n🎯 Processing {len(files)} new files for download...")
         
-        for i, file_path in enumerate(files, 1):
-            print(f"\n📄 [{i}/{len(files)}] Processing: {file_path.name}")
-            
-            # Extract URL from file
-            url = file_service.extract_url_from_file(file_path)
-            
-            if not url:
-                print(f"    ❌ No URL found in {file_path.name}")
-                self.download_stats["no_url_found"] += 1
-            else:
-                print(f"    🔗 Found URL: {url[:60]}...")
-                
-                # Download the file
-                success, downloaded_path, error = self._download_single_file(
-                    url, file_path.name, file_service, api_service
-                )
-                
-                if success:
-                    if error == "File already exists":
-                        print(f"    ⏭️ File already exists: {Path(downloaded_path).name}")
-                        self.download_stats["already_existed"] += 1
-                    else:
-                        print(f"    ✅ Downloaded: {Path(downloaded_path).name}")
-                        self.download_stats["successful_downloads"] += 1
-                else:
-                    print(f"    ❌ Download failed: {error}")
-                    self.download_stats["failed_downloads"] += 1
-            
+        finished = []
+        for i, (file_path, url, result) in enumerate(self._fetch_files(files, file_service, api_service), 1):
+            self.logger.info(f"\n📄 [{i}/{len(files)}] Processing: {file_path.name}")
+            outcome = self._report_result(file_path, url, result)
+            self.download_stats[outcome] += 1
             self.download_stats["total_processed"] += 1
+            if outcome != "failed_downloads":
+                finished.append(file_path)
+        
+        # Failed downloads stay out of the saved keys, so a restart retries them
+        file_service.record_processed_files(finished)
         
         self.print_batch_summary()
     
+    def _fetch_files(self, files: List[Path], file_service, api_service):
+        """Extract URLs and download files in worker threads, yielding (file, url, result) as each finishes
+        
+        Printing and stats stay with the caller on the main thread, so output does not interleave.
+        """
+        pool = self._get_pool()
+        futures = {pool.submit(self._fetch_file, file_path, file_service, api_service): file_path
+                   for file_path in files}
+        for future in as_completed(futures):
+            url, result = future.result()  # Both steps report their own errors instead of raising
+            yield futures[future], url, result
+    
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Start the download threads once per session - idle workers wait for the next poll"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
+            atexit.register(self._pool.shutdown)
+        return self._pool
+    
+    def _fetch_file(self, file_path: Path, file_service, api_service) -> Tuple[Optional[str], Optional[Tuple[bool, Optional[str], Optional[str]]]]:
+        """Extract the URL from one file and download it - runs in a worker thread"""
+        url = file_service.extract_url_from_file(file_path)
+        if not url:
+            return None, None
+        return url, self._download_single_file(url, file_path.name, file_service, api_service)
+    
+    def _report_result(self, file_path: Path, url: Optional[str], result) -> str:
+        """Print the outcome of one file and return its stats key"""
+        if not url:
+            self.logger.warning(f"    ❌ No URL found in {file_path.name}")
+            return "no_url_found"
+        
+        self.logger.info(f"    🔗 Found URL: {url[:60]}...")
+        success, downloaded_path, error = result
+        
+        if success:
+            if error == "File already exists":
+                self.logger.info(f"    ⏭️ File already exists: {Path(downloaded_path).name}")
+                return "already_existed"
+            self.logger.info(f"    ✅ Downloaded: {Path(downloaded_path).name}")
+            return "successful_downloads"
+        
+        self.logger.error(f"    ❌ Download failed: {error}")
+        return "failed_downloads"
+    
     def _download_single_file(self, url: str, source_filename: str, file_service, api_service) -> Tuple[bool, Optional[str], Optional[str]]:
         """Download a single file - combines your original download logic"""
         try:
-            # Detect content type first
-            content_type = api_service.detect_content_type(url)
-            
-            # Prepare filename and path
-            filename, dest_path = file_service.prepare_download_filename(source_filename, content_type, url)
-            
-            # Check if file already exists
-            if file_service.file_already_exists(dest_path):
-                return True, str(dest_path), "File already exists"
+            # A known URL suffix names the file before any request, so an existing download costs nothing
+            content_type = file_service.content_type_from_url(url)
+            if content_type:
+                filename, dest_path = file_service.prepare_download_filename(source_filename, content_type, url)
+                
+                # Check if file already exists
+                if file_service.file_already_exists(dest_path):
+                    return True, str(dest_path), "File already exists"
             
-            # Download file content
+            # Download file content - one GET, whose headers arrive before the body is read
             response, actual_content_type = api_service.download_file_content(url)
             
             if not response:
                 return False, None, "Failed to download content"
             
-            # Update filename if content type changed
+            # Name the file from the GET's own Content-Type
             if actual_content_type != content_type:
                 filename, dest_path = file_service.prepare_download_filename(source_filename, actual_content_type, url)
                 
-                # Check again if file exists with new name
+                # Check again if file exists with new name - and let the body go unread
                 if file_service.file_already_exists(dest_path):
+                    response.close()
                     return True, str(dest_path), "File already exists"
             
             # Save downloaded content
@@ -95,98 +131,73 @@ class ProcessingService:
     
     def print_batch_summary(self):
         """Print batch download summary - exact format from your original"""
-        print(f"\n📊 Batch Download Summary:")
-        print(f"    ✅ Downloaded: {self.download_stats['successful_downloads']}")
-        print(f"    ⏭️ Already existed: {self.download_stats['already_existed']}")
-        print(f"    ❌ Failed: {self.download_stats['failed_downloads']}")
-        print(f"    🔗 No URL: {self.download_stats['no_url_found']}")
+        self.logger.info(f"\n📊 Batch Download Summary:")
+        self.logger.info(f"    ✅ Downloaded: {self.download_stats['successful_downloads']}")
+        self.logger.info(f"    ⏭️ Already existed: {self.download_stats['already_existed']}")
+        self.logger.info(f"    ❌ Failed: {self.download_stats['failed_downloads']}")
+        self.logger.info(f"    🔗 No URL: {self.download_stats['no_url_found']}")
     
     def print_session_stats(self):
         """Print session statistics - exact format from your original"""
-        print(f"\n📊 Session Stats:")
-        print(f"    🕐 Running since: {self.download_stats['start_time']}")
-        print(f"    🔄 Total processed: {self.download_stats['total_processed']}")
-        print(f"    ✅ Downloaded: {self.download_stats['successful_downloads']}")
-        print(f"    ⏭️ Already existed: {self.download_stats['already_existed']}")
-        print(f"    ❌ Failed: {self.download_stats['failed_downloads']}")
-        print(f"    🔗 No URL: {self.download_stats['no_url_found']}")
-        print(f"    📚 Files tracked: {len(self.processed_files)}")
+        self.logger.info(f"\n📊 Session Stats:")
+        self.logger.info(f"    🕐 Running since: {self.download_stats['start_time']}")
+        self.logger.info(f"    🔄 Total processed: {self.download_stats['total_processed']}")
+        self.logger.info(f"    ✅ Downloaded: {self.download_stats['successful_downloads']}")
+        self.logger.info(f"    ⏭️ Already existed: {self.download_stats['already_existed']}")
+        self.logger.info(f"    ❌ Failed: {self.download_stats['failed_downloads']}")
+        self.logger.info(f"    🔗 No URL: {self.download_stats['no_url_found']}")
+        self.logger.info(f"    📚 Files tracked: {len(self.processed_files)}")
     
     def download_existing_files(self, file_service, api_service) -> Dict[str, int]:
         """Manually download all existing files - exact logic from your download_existing_files"""
         source_dir = file_service.get_source_directory()
         
-        print(f"\n🔄 Downloading all existing files in {source_dir}")
+        self.logger.info(f"\n🔄 Downloading all existing files in {source_dir}")
         
         if not source_dir.exists():
-            print(f"❌ Source directory {source_dir} does not exist!")
+            self.logger.error(f"❌ Source directory {source_dir} does not exist!")
             return {"error": 1}
         
-        success_count = 0
-        already_existed = 0
-        failed_count = 0
-        no_url_count = 0
+        counts = {
+            "successful_downloads": 0,
+            "already_existed": 0,
+            "failed_downloads": 0,
+            "no_url_found": 0
+        }
         total_count = 0
         
         # Get all files
         files = file_service.get_all_files_in_source()
         
         if not files:
-            print("📭 No files found to download")
+            self.logger.info("📭 No files found to download")
             return {"total": 0}
         
-        print(f"📂 Found {len(files)} files to download")
-        print("-" * 60)
+        self.logger.info(f"📂 Found {len(files)} files to download")
+        self.logger.info("-" * 60)
         
-        for i, file_path in enumerate(files, 1):
+        for i, (file_path, url, result) in enumerate(self._fetch_files(files, file_service, api_service), 1):
             total_count += 1
-            print(f"\n📄 [{i}/{len(files)}] Processing: {file_path.name}")
-            
-            # Extract URL
-            url = file_service.extract_url_from_file(file_path)
-            
-            if not url:
-                print(f"    ❌ No URL found in {file_path.name}")
-                no_url_count += 1
-            else:
-                print(f"    🔗 Found URL: {url[:60]}...")
-                
-                # Download file
-                success, downloaded_path, error = self._download_single_file(
-                    url, file_path.name, file_service, api_service
-                )
-                
-                if success:
-                    if error == "File already exists":
-                        print(f"    ⏭️ File already exists: {Path(downloaded_path).name}")
-                        already_existed += 1
-                    else:
-                        print(f"    ✅ Downloaded: {Path(downloaded_path).name}")
-                        success_count += 1
-                else:
-                    print(f"    ❌ Download failed: {error}")
-                    failed_count += 1
+            self.logger.info(f"\n📄 [{i}/{len(files)}] Processing: {file_path.name}")
+            counts[self._report_result(file_path, url, result)] += 1
         
         # Print summary - exact format from your original
-        print("\n" + "=" * 60)
-        print("DOWNLOAD SUMMARY")
-        print("=" * 60)
-        print(f"✅ Successfully downloaded: {success_count}")
-        print(f"⏭️ Already existed: {already_existed}")
-        print(f"❌ Failed downloads: {failed_count}")
-        print(f"🔗 No URL found: {no_url_count}")
-        print(f"📊 Total files processed: {total_count}")
-        print("=" * 60)
+        self.logger.info("\n" + "=" * 60)
+        self.logger.info("DOWNLOAD SUMMARY")
+        self.logger.info("=" * 60)
+        self.logger.info(f"✅ Successfully downloaded: {counts['successful_downloads']}")
+        self.logger.info(f"⏭️ Already existed: {counts['already_existed']}")
+        self.logger.info(f"❌ Failed downloads: {counts['failed_downloads']}")
+        self.logger.info(f"🔗 No URL found: {counts['no_url_found']}")
+        self.logger.info(f"📊 Total files processed: {total_count}")
+        self.logger.info("=" * 60)
         
         return {
-            "successful_downloads": success_count,
-            "already_existed": already_existed,
-            "failed_downloads": failed_count,
-            "no_url_found": no_url_count,
+            **counts,
             "total": total_count
         }
     
-    def get_processed_files(self) -> Set[str]:
+    def get_processed_files(self) -> Set[Tuple[str, int, int]]:
         """Get processed files set for file service"""
         return self.processed_files
     
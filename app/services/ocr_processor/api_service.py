@@ -1,5 +1,6 @@
 # app/services/ocr_processor/api_service.py - OCR API service (MATCHES YOUR WORKING DEMO)
 import sys
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Tuple, Optional
@@ -17,15 +18,31 @@ sys.path.insert(0, str(app_dir))
 from config.settings import settings
 from app.services.auth_service import auth_service  # Use the singleton instance
 
+# Read size for receipt file bodies - a receipt photo or PDF arrives in a handful of reads
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
 class APIService:
     """Handles receipt file download API calls - EXACT logic from your working demo"""
     
     def __init__(self):
         self.auth_service = auth_service  # Use singleton
+        self._session_lock = threading.Lock()  # Download threads share one login
+    
+    def _get_session(self) -> requests.Session:
+        """Get the authenticated session - one thread at a time, so an expired login is renewed once"""
+        with self._session_lock:
+            return self.auth_service.get_session()
+    
+    def _renew_session(self, rejected: requests.Session) -> requests.Session:
+        """Log in again after the server rejected a session - unless another thread already has"""
+        with self._session_lock:
+            if self.auth_service.session is rejected:
+                self.auth_service.invalidate_session()
+            return self.auth_service.get_session()
     
     def download_receipt_file(self, feature_code: str) -> Tuple[Optional[bytes], Optional[str]]:
         """Download receipt file - EXACT logic from your working demo"""
-        session = self.auth_service.get_session()
+        session = self._get_session()
         
         # Same parameters as your demo
         ts = int(datetime.utcnow().timestamp() * 1000)
@@ -43,15 +60,23 @@ class APIService:
                 stream=True,
                 timeout=15  # Same timeout as demo
             )
-            resp.raise_for_status()
-            
-            # Same content type handling as demo
-            content_type = resp.headers.get("Content-Type", "").split(";")[0]
+            if resp.status_code == 401:
+                # Login expired since the last check - log in again once and retry
+                resp.close()
+                session = self._renew_session(session)
+                resp = session.get(settings.FILE_API, params=params, stream=True, timeout=15)
             
-            # Same file reading logic as demo
-            file_content = b""
-            for chunk in resp.iter_content(8192):
-                file_content += chunk
+            # Closing the streamed response on every path gives its connection back to the pool -
+            # an error reply left open would hold a pool slot for good
+            with resp:
+                resp.raise_for_status()
+                
+                # Same content type handling as demo
+                content_type = resp.headers.get("Content-Type", "").split(";")[0]
+                
+                # Read the body in large chunks and join once - growing a bytes object chunk by chunk
+                # copies everything read so far on every append
+                file_content = b"".join(resp.iter_content(DOWNLOAD_CHUNK_SIZE))
             
             return file_content, content_type
             
@@ -1,10 +1,11 @@
 # app/services/ocr_processor/file_service.py - OCR file operations (extracted from your ocr_processor.py)
+import os
 import sys
 from pathlib import Path
 import json
 import re
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 # Add project root to path for imports
 current_file = Path(__file__)  # file_service.py
@@ -17,6 +18,38 @@ sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
 
+# Your original encoding map - characters Windows forbids in filenames, plus space and hash
+ENCODING_MAP = {
+    "/": "__SLASH__",
+    ":": "__COLON__",
+    "*": "__STAR__",
+    "?": "__QUESTION__",
+    '"': "__QUOTE__",
+    "<": "__LT__",
+    ">": "__GT__",
+    "|": "__PIPE__",
+    "\\": "__BACKSLASH__",
+    " ": "__SPACE__",
+    "#": "__HASH__"
+}
+
+# Receipt numbers with a run-together timestamp - YYYY-MM-DDHH_MM_SS and YYYY-MM-DDHH:MM:SS
+TIMESTAMP_UNDERSCORE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})(\d{2})_(\d{2})_(\d{2})')
+TIMESTAMP_NO_SPACE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})(\d{2}:\d{2}:\d{2})')
+
+class _FilenameMarkers(dict):
+    """str.translate table for receipt filenames - non-ASCII characters get their __U<code>__ marker on first sight"""
+    
+    def __missing__(self, codepoint: int):
+        # ASCII maps to itself; a None entry would delete the character
+        marker = f"__U{codepoint}__" if codepoint > 127 else codepoint
+        self[codepoint] = marker
+        return marker
+
+# Shared by every receipt - the forbidden characters and every Chinese character seen so far,
+# so encoding a filename is one pass over it. Markers are plain ASCII and never re-encoded.
+_FILENAME_MARKERS = _FilenameMarkers({ord(char): marker for char, marker in ENCODING_MAP.items()})
+
 class FileService:
     """Handles OCR file operations - extracted from your ocr_processor.py"""
     
@@ -25,6 +58,15 @@ class FileService:
         self.monitor_dir = settings.OCR_MONITOR_DIR
         self.today = datetime.now().strftime("%Y-%m-%d")
         self.today_ocr_dir = self.base_ocr_dir / self.today  # Today's date folder
+        
+        # featureCodes downloaded today, kept across restarts - .processed_2025-07-23.txt in the base folder
+        self.processed_log = self.base_ocr_dir / f".processed_{self.today}.txt"
+        
+        # What the monitor has already read from the receipts JSON file
+        self._json_file: Optional[Path] = None
+        self._json_signature: Optional[Tuple[int, int]] = None  # (mtime_ns, size) at the last read
+        self._receipt_count = 0  # Receipts already handed out from _json_file
+        
         self._setup_folders()
     
     def _setup_folders(self):
@@ -40,39 +82,16 @@ class FileService:
         return self.today_ocr_dir
     
     def encode_filename(self, number: str) -> str:
-        """Replace ALL forbidden characters - EXACT copy from your original code"""
+        """Replace ALL forbidden characters and non-ASCII characters - one str.translate pass"""
         if not number:
             return number
         
-        # Your original encoding map
-        ENCODING_MAP = {
-            "/": "__SLASH__",
-            ":": "__COLON__",
-            "*": "__STAR__",
-            "?": "__QUESTION__",
-            '"': "__QUOTE__",
-            "<": "__LT__",
-            ">": "__GT__",
-            "|": "__PIPE__",
-            "\\": "__BACKSLASH__",
-            " ": "__SPACE__",
-            "#": "__HASH__"
-        }
-        
-        encoded = str(number)
-        changes_made = []
-        
-        # Apply all encodings - exactly like your original
-        for char, marker in ENCODING_MAP.items():
-            if char in encoded:
-                encoded = encoded.replace(char, marker)
-                changes_made.append(f"{char} → {marker}")
-        
-        # Handle non-ASCII characters (Chinese, etc.) - from your original
-        encoded = self._sanitize_filename(encoded)
+        original = str(number)
+        encoded = original.translate(_FILENAME_MARKERS)
         
         # Log if encoding happened - exactly like your original
-        if changes_made or encoded != str(number):
+        if encoded != original:
+            changes_made = [f"{char} → {marker}" for char, marker in ENCODING_MAP.items() if char in original]
             print(f"    📝 Encoded: {number}")
             print(f"       → {encoded}")
             if changes_made:
@@ -80,32 +99,20 @@ class FileService:
         
         return encoded
     
-    def _sanitize_filename(self, filename: str) -> str:
-        """Remove or replace characters - EXACT copy from your original"""
-        sanitized = ""
-        for char in filename:
-            if ord(char) > 127:  # Non-ASCII character
-                sanitized += f"__U{ord(char)}__"
-            else:
-                sanitized += char
-        return sanitized
-    
     def fix_timestamp_format(self, number: str) -> str:
         """Fix various timestamp format issues - EXACT copy from your original"""
         if not number or not isinstance(number, str):
             return number
         
         # Pattern 1: YYYY-MM-DDHH_MM_SS → YYYY-MM-DD HH:MM:SS
-        pattern1 = r'(\d{4}-\d{2}-\d{2})(\d{2})_(\d{2})_(\d{2})'
-        match1 = re.search(pattern1, number)
+        match1 = TIMESTAMP_UNDERSCORE_RE.search(number)
         if match1:
             fixed = number.replace(match1.group(0), f"{match1.group(1)} {match1.group(2)}:{match1.group(3)}:{match1.group(4)}")
             print(f"    🕐 Fixed timestamp: {number} → {fixed}")
             return fixed
         
         # Pattern 2: YYYY-MM-DDHH:MM:SS → YYYY-MM-DD HH:MM:SS (add space)
-        pattern2 = r'(\d{4}-\d{2}-\d{2})(\d{2}:\d{2}:\d{2})'
-        match2 = re.search(pattern2, number)
+        match2 = TIMESTAMP_NO_SPACE_RE.search(number)
         if match2:
             fixed = number.replace(match2.group(0), f"{match2.group(1)} {match2.group(2)}")
             print(f"    🕐 Fixed timestamp: {number} → {fixed}")
@@ -165,22 +172,90 @@ class FileService:
         if not json_file:
             return []
         
+        receipts = self._read_receipts(json_file)
+        if receipts is None:
+            return []
+        
+        print(f"    📊 Found {len(receipts)} receipts in {json_file.name}")
+        return receipts
+    
+    def load_new_receipts_from_json(self) -> List[Dict[str, Any]]:
+        """Load only the receipts added to today's JSON file since the last call
+        
+        The realtime detector only ever appends to the file, so an unchanged mtime and size
+        means nothing new, and otherwise the new receipts are the ones past the last count.
+        """
+        json_file = self.find_todays_json_file()
+        
+        if not json_file:
+            return []
+        
+        # A new day's file starts from its first receipt
+        if json_file != self._json_file:
+            self._json_file = json_file
+            self._json_signature = None
+            self._receipt_count = 0
+        
+        try:
+            st = json_file.stat()
+        except FileNotFoundError:
+            return []
+        
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._json_signature:
+            print(f"    📊 {json_file.name} unchanged since the last check")
+            return []
+        
+        receipts = self._read_receipts(json_file)
+        if receipts is None:
+            return []  # Read again next check - the detector may have been mid-write
+        
+        # Fewer receipts than before means the file was rewritten, not appended to
+        if len(receipts) < self._receipt_count:
+            self._receipt_count = 0
+        
+        new_receipts = receipts[self._receipt_count:]
+        self._json_signature = signature
+        self._receipt_count = len(receipts)
+        
+        print(f"    📊 Found {len(receipts)} receipts in {json_file.name}, {len(new_receipts)} new")
+        return new_receipts
+    
+    def _read_receipts(self, json_file: Path) -> Optional[List[Dict[str, Any]]]:
+        """Parse the receipts list out of a receipts JSON file - None if it can't be read"""
         try:
             with open(json_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
             
             # Handle both old and new format
             if "receipts" in data:  # New format (from enhanced realtime detector)
-                receipts = data["receipts"]
-            else:  # Old format - exactly like your original
-                receipts = data.get("new_receipts", [])
-            
-            print(f"    📊 Found {len(receipts)} receipts in {json_file.name}")
-            return receipts
+                return data["receipts"]
+            return data.get("new_receipts", [])  # Old format - exactly like your original
             
         except Exception as e:
             print(f"❌ Error reading JSON file: {e}")
-            return []
+            return None
+    
+    def load_processed_feature_codes(self) -> Set[str]:
+        """Load the featureCodes earlier runs downloaded today"""
+        try:
+            with open(self.processed_log, 'r', encoding='utf-8') as f:
+                return {line.rstrip('\n') for line in f if line.endswith('\n')}  # Skip a line cut short by a crash
+        except FileNotFoundError:
+            return set()
+    
+    def record_processed_feature_codes(self, feature_codes: List[str]):
+        """Append a batch's downloaded featureCodes to today's processed log - one durable write per batch"""
+        if not feature_codes:
+            return
+        
+        try:
+            with open(self.processed_log, 'a', encoding='utf-8') as f:
+                f.write(''.join(f"{feature_code}\n" for feature_code in feature_codes))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"⚠️ Could not record processed featureCodes: {e}")
     
     def get_example_files(self, count: int = 5) -> List[str]:
         """Get example filenames for debugging - from today's folder"""
@@ -1,9 +1,12 @@
 # app/services/ocr_text_processor/file_service.py - Enhanced OCR text processor with date detection
 import sys
+import os
+import hashlib
 from pathlib import Path
 import json
+import orjson
 from datetime import datetime
-from typing import List, Optional, Set, Dict
+from typing import Any, List, Optional, Set, Dict, Tuple
 
 # Add project root to path for imports
 current_file = Path(__file__)  # file_service.py
@@ -16,6 +19,16 @@ sys.path.insert(0, str(app_dir))
 
 from config.settings import settings
 
+# Days an OCR cache entry is kept after it was last written or reused - older entries are removed at startup
+OCR_CACHE_MAX_AGE_DAYS = 7
+
+def _dumps_json(data: Any) -> bytes:
+    """Serialize to indented UTF-8 JSON bytes (same layout as json.dump indent=2, ensure_ascii=False)"""
+    try:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
 class FileService:
     """Enhanced OCR text processor file service with date folder detection"""
     
@@ -29,6 +42,10 @@ class FileService:
         self.today_source_dir = self.source_dir / self.today  # worker/data/downloaded_receipts/2025-07-30/
         self.today_output_dir = self.output_dir / self.today  # worker/data/receipt_ocr_text/2025-07-30/
         
+        # OCR results by image content, so identical images are read once - worker/data/ocr_cache/<digest>.json
+        self.cache_dir = settings.WORKER_DIR / "data" / "ocr_cache"
+        self._ocr_cache: Dict[str, Tuple[str, float, str]] = {}  # This session's hits and saves
+        
         # Supported image formats - exactly like your original
         self.supported_formats = {'.bmp', '.png', '.jpg', '.jpeg', '.tiff', '.tif', '.webp', '.gif'}
         
@@ -44,6 +61,8 @@ class FileService:
         
         # Create today's directories
         self.today_output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._prune_ocr_cache()
         
         print(f"📁 Enhanced OCR folders ready:")
         print(f"   📂 Source: {self.today_source_dir}")
@@ -112,21 +131,45 @@ class FileService:
         
         return new_files
     
+    def accept_event_files(self, paths: List[Path], processed_files: Set[str]) -> List[Path]:
+        """Filter file-watcher paths down to new image files in today's source directory"""
+        new_files = []
+        
+        for file_path in dict.fromkeys(paths):
+            if (file_path.parent != self.today_source_dir or
+                file_path.suffix.lower() not in self.supported_formats):
+                continue
+            
+            try:
+                mtime = file_path.stat().st_mtime
+            except FileNotFoundError:
+                continue  # Gone before we got to it
+            
+            file_key = f"{file_path.name}_{mtime}_{self.today}"
+            if file_key not in processed_files:
+                new_files.append(file_path)
+                processed_files.add(file_key)
+                self.file_date_map[file_path.name] = self.today
+        
+        return new_files
+    
     def _scan_single_directory(self, directory: Path, processed_files: Set[str], date_folder: str) -> List[Path]:
         """Scan a single directory for new image files"""
         new_files = []
         
-        for file_path in directory.iterdir():
-            if (file_path.is_file() and 
-                file_path.suffix.lower() in self.supported_formats):
-                
-                file_key = f"{file_path.name}_{file_path.stat().st_mtime}_{date_folder}"
-                
-                if file_key not in processed_files:
-                    new_files.append(file_path)
-                    processed_files.add(file_key)
-                    # Track which date folder this file belongs to
-                    self.file_date_map[file_path.name] = date_folder
+        # scandir entries carry the file type, so only the stat for the mtime costs a syscall
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if (entry.is_file() and 
+                    os.path.splitext(entry.name)[1].lower() in self.supported_formats):
+                    
+                    file_key = f"{entry.name}_{entry.stat().st_mtime}_{date_folder}"
+                    
+                    if file_key not in processed_files:
+                        new_files.append(Path(entry.path))
+                        processed_files.add(file_key)
+                        # Track which date folder this file belongs to
+                        self.file_date_map[entry.name] = date_folder
         
         return new_files
     
@@ -140,6 +183,55 @@ class FileService:
         output_path = output_dir / output_filename
         return output_path.exists()
     
+    def _prune_ocr_cache(self):
+        """Remove OCR cache entries not written or reused within OCR_CACHE_MAX_AGE_DAYS"""
+        cutoff = datetime.now().timestamp() - OCR_CACHE_MAX_AGE_DAYS * 86400
+        removed = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError:
+                    pass  # Removed or in use elsewhere - the next startup tries again
+        if removed:
+            print(f"   🧹 Removed {removed} expired OCR cache entries")
+    
+    def image_digest(self, image_path: Path) -> Optional[str]:
+        """Content digest of an image - blake2b, the fastest hashlib digest on 64-bit machines"""
+        try:
+            return hashlib.blake2b(image_path.read_bytes(), digest_size=16).hexdigest()
+        except OSError:
+            return None
+    
+    def load_cached_ocr(self, digest: str) -> Optional[Tuple[str, float, str]]:
+        """OCR result (text, confidence, language) of an identical image seen before, or None"""
+        cached = self._ocr_cache.get(digest)
+        if cached is not None:
+            return cached
+        
+        cache_path = self.cache_dir / f"{digest}.json"
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            cached = (entry["data"], entry["confidence"], entry["language"])
+            os.utime(cache_path)  # Reused - keep it past the next startup's pruning
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        self._ocr_cache[digest] = cached
+        return cached
+    
+    def save_cached_ocr(self, digest: str, ocr_text: str, confidence: float, language: str):
+        """Keep a successful OCR result for identical images processed later"""
+        self._ocr_cache[digest] = (ocr_text, confidence, language)
+        try:
+            entry = {"data": ocr_text, "confidence": confidence, "language": language}
+            (self.cache_dir / f"{digest}.json").write_bytes(_dumps_json(entry))
+        except OSError as e:
+            print(f"    ⚠️  Could not cache OCR result: {e}")
+    
     def save_ocr_result(self, image_path: Path, ocr_text: str, confidence: float, 
                        language: str, processing_time: float) -> bool:
         """Save OCR result with date-aware organization"""
@@ -174,8 +266,7 @@ class FileService:
             }
             
             # Save JSON file
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            output_path.write_bytes(_dumps_json(output_data))
             
             print(f"    ✅ Saved to: {date_folder}/{output_filename}")
             return True
@@ -214,8 +305,7 @@ class FileService:
                 }
             }
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            output_path.write_bytes(_dumps_json(output_data))
             
             print(f"    ❌ Error saved to: {date_folder}/{output_filename}")
             return True
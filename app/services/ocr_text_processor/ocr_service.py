@@ -1,6 +1,14 @@
 # app/services/ocr_text_processor/ocr_service.py - OCR processing service
+import os
 import sys
 from pathlib import Path
+
+# One OpenMP thread per Tesseract - OCR already runs one worker process per core, and N processes
+# each starting N OpenMP threads oversubscribe the CPU. Must be set before the libraries load;
+# tesseract processes started by pytesseract inherit it.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import cv2
 import numpy as np
 from PIL import Image
@@ -8,6 +16,12 @@ import pytesseract
 import logging
 from typing import Tuple
 
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 # Add project root to path for imports
 current_file = Path(__file__)  # ocr_service.py
 services_dir = current_file.parent.parent  # services/
@@ -19,11 +33,61 @@ sys.path.insert(0, str(app_dir))
 
 logger = logging.getLogger(__name__)
 
+# Fast OCR settings - --psm 6 with Chinese + English, falling back to plain English
+OCR_LANGUAGE = 'chi_sim+eng'
+FALLBACK_LANGUAGE = 'eng'
+OCR_ENGINE_MODE = 1  # LSTM only - the legacy engine's models are never loaded
+MIN_CONFIDENCE = 30  # Lower threshold for speed
+
+# Images whose shorter side is larger than this are scaled down before preprocessing - Tesseract
+# gains nothing past ~300 DPI text, and every later step is linear in pixels. The shorter side is
+# used so long, narrow receipt scans keep their text height.
+MAX_OCR_SHORT_SIDE = 2000
+
+# Denoising - an edge-preserving bilateral filter, with the much slower non-local means kept for
+# images whose Otsu binarization comes out mostly dark (speckle or a dim background, not just ink)
+BILATERAL_DIAMETER = 5
+BILATERAL_SIGMA = 50
+MAX_CLEAN_INK = 0.60
+
+# Binarization - one global Otsu threshold, unless the share of white pixels it leaves falls outside
+# this range (uneven lighting); then a local mean threshold, which OpenCV runs as a box filter
+OTSU_WHITE_RANGE = (0.10, 0.90)
+ADAPTIVE_BLOCK_SIZE = 15
+ADAPTIVE_OFFSET = 5
+
+# Share of black pixels a binarized receipt with text can have - pages outside this range are blank,
+# black or corrupted, and are saved with empty text instead of going through Tesseract
+TEXT_INK_RANGE = (0.005, 0.70)
+
 class OCRService:
     """Handles OCR processing operations - extracted from your RealtimeOCRProcessor class"""
     
     def __init__(self):
-        pass
+        # Tesseract engines kept loaded for the session when tesserocr is installed -
+        # pytesseract starts a tesseract process and reloads the language models on every call
+        self.api = None
+        self._fallback_api = None
+        self._use_tesserocr = TESSEROCR_AVAILABLE
+    
+    def _get_api(self):
+        """Load the session's Tesseract engine on first use - None when running through pytesseract"""
+        if self.api is None and self._use_tesserocr:
+            try:
+                self.api = tesserocr.PyTessBaseAPI(lang=OCR_LANGUAGE, oem=tesserocr.OEM.LSTM_ONLY,
+                                                   psm=tesserocr.PSM.SINGLE_BLOCK)
+            except RuntimeError as e:
+                logger.warning(f"tesserocr unavailable, using pytesseract: {e}")
+                self._use_tesserocr = False
+        return self.api
+    
+    def close(self):
+        """Release the loaded Tesseract engines"""
+        for api in (self.api, self._fallback_api):
+            if api is not None:
+                api.End()
+        self.api = None
+        self._fallback_api = None
     
     def check_tesseract_installation(self) -> bool:
         """Check if Tesseract is properly installed - exact logic from your original"""
@@ -50,75 +114,140 @@ class OCRService:
     def preprocess_image(self, image_path: Path):
         """Preprocess image for better OCR accuracy - EXACT logic from your original"""
         try:
-            # Read image
-            image = cv2.imread(str(image_path))
-            if image is None:
+            # Read image straight to grayscale - the decoder skips the color planes and the conversion
+            gray = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
                 return None
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Scale down oversized photos
+            short_side = min(gray.shape[:2])
+            if short_side > MAX_OCR_SHORT_SIDE:
+                scale = MAX_OCR_SHORT_SIDE / short_side
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             
             # Apply denoising (fast version for real-time)
-            denoised = cv2.fastNlMeansDenoising(gray, h=10)
+            denoised = self._denoise(gray)
             
-            # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            
-            return thresh
+            # Apply thresholding
+            return self._binarize(denoised)
             
         except Exception as e:
             logger.error(f"Error preprocessing {image_path}: {str(e)}")
             return None
     
+    def _denoise(self, gray):
+        """Denoise a grayscale receipt - bilateral filter, or non-local means when the image looks noisy"""
+        _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        ink = 1 - cv2.countNonZero(otsu) / otsu.size
+        
+        if ink <= MAX_CLEAN_INK:
+            return cv2.bilateralFilter(gray, BILATERAL_DIAMETER, BILATERAL_SIGMA, BILATERAL_SIGMA)
+        return cv2.fastNlMeansDenoising(gray, h=10)
+    
+    def _binarize(self, denoised):
+        """Black-and-white image for Tesseract - global Otsu, or a local threshold under uneven lighting"""
+        _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        white = cv2.countNonZero(thresh) / thresh.size
+        
+        low, high = OTSU_WHITE_RANGE
+        if low <= white <= high:
+            return thresh
+        return cv2.adaptiveThreshold(
+            denoised, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, ADAPTIVE_BLOCK_SIZE, ADAPTIVE_OFFSET
+        )
+    
+    def _has_text_ink(self, binary) -> bool:
+        """Whether the binarized page's share of black pixels is in the range text produces"""
+        ink = 1 - cv2.countNonZero(binary) / binary.size
+        low, high = TEXT_INK_RANGE
+        return low <= ink <= high
+    
     def perform_fast_ocr(self, image) -> Tuple[str, float, str]:
         """Perform fast OCR optimized for real-time processing - EXACT logic from your original"""
         try:
+            if self._get_api() is not None:
+                return self._perform_tesserocr(image)
+            
             # Convert to PIL Image
             pil_image = Image.fromarray(image)
             
-            # Fast OCR configuration - exactly like your original
-            config = r'--oem 3 --psm 6'
+            # Fast OCR configuration - single uniform block of text, LSTM engine only
+            config = f'--oem {OCR_ENGINE_MODE} --psm 6'
             
             # Try languages in order of speed (fastest first) - exactly like your original
-            languages = ['chi_sim+eng']
+            languages = [OCR_LANGUAGE]
             
             for lang in languages:
                 try:
-                    # Quick confidence check first
+                    # One recognition pass gives both the words and their confidences
                     data = pytesseract.image_to_data(
                         pil_image, lang=lang, config=config, 
                         output_type=pytesseract.Output.DICT
                     )
                     
-                    confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                    avg_confidence = self._mean_confidence(data['conf'])
                     
                     # If confidence is good enough, use this result - exactly like your original
-                    if avg_confidence > 30:  # Lower threshold for speed
-                        result = pytesseract.image_to_string(pil_image, lang=lang, config=config)
-                        return result.strip(), avg_confidence, lang
+                    if avg_confidence > MIN_CONFIDENCE:
+                        return self._text_from_data(data), avg_confidence, lang
                     
                 except Exception:
                     continue
             
             # Fallback to basic English OCR - exactly like your original
-            result = pytesseract.image_to_string(pil_image, lang='eng')
-            return result.strip(), 0, 'eng'
+            result = pytesseract.image_to_string(pil_image, lang=FALLBACK_LANGUAGE, config=f'--oem {OCR_ENGINE_MODE}')
+            return result.strip(), 0, FALLBACK_LANGUAGE
             
         except Exception as e:
             logger.error(f"OCR error: {str(e)}")
             return "", 0, "error"
     
+    def _mean_confidence(self, confidences) -> float:
+        """Mean of the positive word confidences (truncated to integers, -1 marks non-word rows), or 0"""
+        confs = np.asarray(confidences, dtype=np.float64).astype(np.int32)
+        positive = confs[confs > 0]
+        return float(positive.mean()) if positive.size else 0
+    
+    def _text_from_data(self, data: dict) -> str:
+        """Rebuild the page text from image_to_data words - the same lines image_to_string would print"""
+        # Words joined by single spaces, one line per (block, paragraph, line); image_to_string's
+        # blank lines between paragraphs would be dropped by clean_ocr_text anyway
+        lines = {}
+        for word, block, par, line in zip(data['text'], data['block_num'], data['par_num'], data['line_num']):
+            if word and not word.isspace():
+                lines.setdefault((block, par, line), []).append(word)
+        return '\n'.join(' '.join(words) for words in lines.values())
+    
+    def _perform_tesserocr(self, image) -> Tuple[str, float, str]:
+        """Same OCR on the loaded engine - one recognition pass gives both the text and the confidences"""
+        try:
+            self._set_image(self.api, image)
+            text = self.api.GetUTF8Text()
+            avg_confidence = self._mean_confidence(self.api.AllWordConfidences())
+            
+            if avg_confidence > MIN_CONFIDENCE:
+                return text.strip(), avg_confidence, OCR_LANGUAGE
+        except RuntimeError:
+            pass
+        
+        # Fallback to basic English OCR, with Tesseract's default page segmentation
+        if self._fallback_api is None:
+            self._fallback_api = tesserocr.PyTessBaseAPI(lang=FALLBACK_LANGUAGE, oem=tesserocr.OEM.LSTM_ONLY)
+        self._set_image(self._fallback_api, image)
+        return self._fallback_api.GetUTF8Text().strip(), 0, FALLBACK_LANGUAGE
+    
+    def _set_image(self, api, image):
+        """Hand the 8-bit black-and-white array to Tesseract as raw pixels - SetImage would encode a PIL image first"""
+        height, width = image.shape[:2]
+        api.SetImageBytes(image.tobytes(), width, height, 1, width)
+    
     def clean_ocr_text(self, text: str) -> str:
         """Clean OCR text for better readability - EXACT logic from your original"""
         if not text:
             return ""
         
-        lines = text.split('\n')
-        cleaned_lines = [line.strip() for line in lines if line.strip()]
-        return '\r\n'.join(cleaned_lines)
+        # Strip each line once and drop the empty ones, all inside C-level iteration
+        return '\r\n'.join(filter(None, map(str.strip, text.split('\n'))))
     
     def process_image_ocr(self, image_path: Path) -> Tuple[str, float, str]:
         """Complete OCR processing pipeline - combines your preprocessing and OCR logic"""
@@ -128,6 +257,10 @@ class OCRService:
             if preprocessed is None:
                 return "", 0, "preprocessing_error"
             
+            # Nothing to read on blank or black pages
+            if not self._has_text_ink(preprocessed):
+                return "", 0, "skipped_blank"
+            
             # Perform OCR
             ocr_text, confidence, language = self.perform_fast_ocr(preprocessed)
             
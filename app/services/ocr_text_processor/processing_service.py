@@ -1,18 +1,58 @@
 # app/services/ocr_text_processor/processing_service.py - OCR text processing logic
+import atexit
+import multiprocessing
+import os
+import signal
 import time
 import logging
 from datetime import datetime
-from typing import Set, Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 from pathlib import Path
+from multiprocessing.pool import Pool
+
+from app.utils.processed_keys import ProcessedFileKeys
 
 logger = logging.getLogger(__name__)
 
+# OCR worker processes - Tesseract scales across processes, not threads
+OCR_WORKERS = os.cpu_count() or 1
+
+# Each worker process's own OCRService, so its Tesseract engine loads once per process
+_worker_ocr_service = None
+
+def _init_worker():
+    """Set up an OCR worker process"""
+    global _worker_ocr_service
+    
+    # Ctrl+C is handled by the main process, which stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    # Importing the OCR service also limits Tesseract to one OpenMP thread per process
+    from services.ocr_text_processor.ocr_service import OCRService
+    _worker_ocr_service = OCRService()
+
+def _worker_ocr(task: Tuple[str, Optional[Tuple[str, float, str]]]) -> Tuple[str, str, float, str, float]:
+    """OCR one image in a worker process - returns (path, text, confidence, language, seconds)
+    
+    Tasks carrying the cached OCR of an identical image come straight back.
+    """
+    image_path, cached = task
+    if cached:
+        return (image_path, *cached, 0.0)
+    
+    start_time = time.time()
+    ocr_text, confidence, language = _worker_ocr_service.process_image_ocr(Path(image_path))
+    return image_path, ocr_text, confidence, language, time.time() - start_time
+
 class ProcessingService:
     """Handles OCR text processing logic - extracted from your RealtimeOCRProcessor class"""
     
     def __init__(self):
         # Exact same tracking as your original class
-        self.processed_files: Set[str] = set()  # Track files we've processed (session only)
+        # Images stay in the source folders - a forgotten key only means the image is picked up
+        # again and skipped on its existing output JSON
+        self.processed_files = ProcessedFileKeys()  # Track files we've processed (session only)
+        self._pool: Optional[Pool] = None
         self.ocr_stats = {
             "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_processed": 0,
@@ -26,32 +66,22 @@ class ProcessingService:
         self.batch_size = 10  # Process 10 files at a time
         self.max_processing_time = 300  # 5 minutes max per batch
     
-    def process_single_file(self, image_path: Path, file_service, ocr_service) -> Tuple[bool, float]:
-        """Process a single image file - exact logic from your process_single_file"""
-        start_time = time.time()
-        
+    def _save_ocr_outcome(self, image_path: Path, ocr_text: str, confidence: float, language: str,
+                          processing_time: float, file_service, digest: Optional[str] = None) -> Tuple[bool, float]:
+        """Save the OCR result (or its error) for one image - and cache it under the image's digest, if given"""
         try:
-            logger.info(f"Processing: {image_path.name}")
-            
-            # Check if output already exists
-            if file_service.output_file_exists(image_path):
-                logger.info(f"Output already exists: {image_path.stem}.json")
-                return True, time.time() - start_time
-            
-            # Perform OCR
-            ocr_text, confidence, language = ocr_service.process_image_ocr(image_path)
-            
             if language in ["error", "preprocessing_error", "pipeline_error"]:
                 # Save error result
-                processing_time = time.time() - start_time
                 file_service.save_ocr_error(image_path, f"OCR failed: {language}", processing_time)
                 logger.error(f"Failed to process: {image_path.name} ({language})")
                 return False, processing_time
             
             # Save successful result
-            processing_time = time.time() - start_time
             success = file_service.save_ocr_result(image_path, ocr_text, confidence, language, processing_time)
             
+            if success and digest:
+                file_service.save_cached_ocr(digest, ocr_text, confidence, language)
+            
             if success:
                 logger.info(f"✓ Completed {image_path.name} in {processing_time:.2f}s (confidence: {confidence:.1f}%)")
                 return True, processing_time
@@ -59,13 +89,37 @@ class ProcessingService:
                 return False, processing_time
             
         except Exception as e:
-            processing_time = time.time() - start_time
             logger.error(f"Error processing {image_path.name}: {str(e)}")
             file_service.save_ocr_error(image_path, str(e), processing_time)
             return False, processing_time
     
+    def _get_pool(self) -> Pool:
+        """Start the OCR worker processes once per session - idle workers wait for the next batch"""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(OCR_WORKERS, initializer=_init_worker)
+            atexit.register(self.close)
+        return self._pool
+    
+    def close(self):
+        """Stop the OCR worker processes"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+    
+    def _update_file_stats(self, proc_time: float):
+        """Add one processed file to the session stats - exactly like your original"""
+        self.ocr_stats["total_processed"] += 1
+        self.ocr_stats["total_processing_time"] += proc_time
+        
+        if self.ocr_stats["total_processed"] > 0:
+            self.ocr_stats["average_time_per_file"] = (
+                self.ocr_stats["total_processing_time"] / 
+                self.ocr_stats["total_processed"]
+            )
+    
     def process_batch(self, files: List[Path], file_service, ocr_service) -> None:
-        """Process a batch of files with time limit - exact logic from your process_batch"""
+        """Process a batch of files with time limit - OCR runs in the worker processes, results stream back as they finish"""
         if not files:
             return
         
@@ -76,16 +130,44 @@ class ProcessingService:
         
         print(f"\n🎯 Processing batch of {len(files)} files...")
         
-        for i, file_path in enumerate(files, 1):
-            # Check if we're running out of time - exactly like your original
-            elapsed = time.time() - batch_start
-            if elapsed > self.max_processing_time:
-                logger.warning(f"Batch timeout reached after {elapsed:.1f}s, stopping at file {i}")
+        # Files whose output is already saved are done here; the rest go to the OCR workers
+        pending = []
+        for file_path in files:
+            if file_service.output_file_exists(file_path):
+                logger.info(f"Output already exists: {file_path.stem}.json")
+                successful += 1
+                self._update_file_stats(0)
+            else:
+                pending.append(file_path)
+        
+        # The pool draws tasks from a background thread, so images are read and hashed for the
+        # OCR cache while earlier ones are still being OCR'd
+        digests = {}
+        tasks = self._ocr_tasks(pending, file_service, digests)
+        results = self._get_pool().imap_unordered(_worker_ocr, tasks) if pending else iter(())
+        
+        for i in range(1, len(pending) + 1):
+            # Wait no longer than the batch has left - exactly like your original time limit
+            remaining = self.max_processing_time - (time.time() - batch_start)
+            try:
+                image_path, ocr_text, confidence, language, ocr_time = results.next(timeout=max(remaining, 0))
+            except multiprocessing.TimeoutError:
+                logger.warning(f"Batch timeout reached after {time.time() - batch_start:.1f}s, "
+                               f"stopping with {len(pending) - i + 1} files unfinished")
+                self.close()  # Stop the OCR still running; the next batch starts fresh workers
                 break
+            except Exception as e:
+                logger.error(f"OCR worker error: {str(e)}")
+                failed += 1
+                self._update_file_stats(0)
+                continue
             
-            print(f"📄 [{i}/{len(files)}] {file_path.name}")
+            digest = digests.get(image_path)
+            image_path = Path(image_path)
+            print(f"📄 [{i}/{len(pending)}] {image_path.name}")
             
-            success, proc_time = self.process_single_file(file_path, file_service, ocr_service)
+            success, proc_time = self._save_ocr_outcome(image_path, ocr_text, confidence, language,
+                                                        ocr_time, file_service, digest)
             total_processing_time += proc_time
             
             if success:
@@ -93,15 +175,7 @@ class ProcessingService:
             else:
                 failed += 1
             
-            # Update stats - exactly like your original
-            self.ocr_stats["total_processed"] += 1
-            self.ocr_stats["total_processing_time"] += proc_time
-            
-            if self.ocr_stats["total_processed"] > 0:
-                self.ocr_stats["average_time_per_file"] = (
-                    self.ocr_stats["total_processing_time"] / 
-                    self.ocr_stats["total_processed"]
-                )
+            self._update_file_stats(proc_time)
         
         batch_time = time.time() - batch_start
         
@@ -111,6 +185,17 @@ class ProcessingService:
         
         self.print_batch_summary(successful, failed, batch_time, total_processing_time, len(files))
     
+    def _ocr_tasks(self, files: List[Path], file_service, digests: Dict[str, Optional[str]]):
+        """Yield a (path, cached OCR or None) task per file, noting the digest of each image to be OCR'd"""
+        for file_path in files:
+            digest = file_service.image_digest(file_path)
+            cached = file_service.load_cached_ocr(digest) if digest else None
+            if cached:
+                logger.info(f"Reusing OCR of an identical image: {file_path.name}")
+            else:
+                digests[str(file_path)] = digest
+            yield str(file_path), cached
+    
     def print_batch_summary(self, successful: int, failed: int, batch_time: float, 
                            total_processing_time: float, file_count: int):
         """Print batch summary - exact format from your original"""
@@ -176,7 +261,7 @@ class ProcessingService:
             "total": self.ocr_stats['total_processed']
         }
     
-    def get_processed_files(self) -> Set[str]:
+    def get_processed_files(self) -> 'ProcessedFileKeys':
         """Get processed files set for file service"""
         return self.processed_files
     
@@ -12,6 +12,12 @@ class ReceiptAPIService:
     def __init__(self):
         self.auth_service = AuthenticationService()
     
+    def _renew_session(self, rejected: requests.Session) -> requests.Session:
+        """Log in again after the server rejected a session - unless it was already replaced"""
+        if self.auth_service.session is rejected:
+            self.auth_service.invalidate_session()
+        return self.auth_service.get_session()
+    
     def fetch_recent_receipts(self) -> List[Dict[str, Any]]:
         """Fetch TODAY's receipts - exact logic from your original function"""
         today = datetime.utcnow().strftime("%Y-%m-%d")
@@ -30,9 +36,9 @@ class ReceiptAPIService:
         start = 0
         page_size = settings.realtime_detector.page_size
         
-        session = self.auth_service.get_session()
-        
         while True:
+            # Fetched per batch - a login renewed after a 401 is used for the remaining pages
+            session = self.auth_service.get_session()
             batch_records = self._fetch_receipt_batch(
                 session, start_ts, end_ts, start, page_size
             )
@@ -82,6 +88,16 @@ class ReceiptAPIService:
                 headers={"Accept": "application/json"}, 
                 timeout=settings.realtime_detector.request_timeout
             )
+            if r.status_code == 401:
+                # Login expired since the last check - log in again once and retry
+                r.close()
+                session = self._renew_session(session)
+                r = session.post(
+                    url, 
+                    json=payload, 
+                    headers={"Accept": "application/json"}, 
+                    timeout=settings.realtime_detector.request_timeout
+                )
             r.raise_for_status()
             
             data = r.json().get("data", [])
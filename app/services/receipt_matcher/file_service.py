@@ -4,6 +4,7 @@ from pathlib import Path
 import json
 import shutil
 import os
+import errno
 import re  # FIXED: Added missing import
 from datetime import datetime
 from typing import List, Optional, Set, Dict, Any
@@ -36,6 +37,10 @@ class FileService:
         self.today_output_dir = self.output_dir / self.today            # worker/data/matched_non_delivery/2025-07-23/
         self.today_processed_dir = self.today_output_dir / "processed_files"  # processed files for today
         
+        # Pre-formed directory strings so per-file paths are a single concatenation
+        self._output_str = str(self.today_output_dir)
+        self._processed_str = str(self.today_processed_dir)
+        
         # Encoding map - exactly like your original
         self.ENCODING_MAP = {
             "/": "__SLASH__",
@@ -200,10 +205,10 @@ class FileService:
             
             # Create safe filename
             safe_filename = self.encode_filename(number)
-            json_file = self.today_output_dir / f"{safe_filename}.json"
+            json_file = f"{self._output_str}{os.sep}{safe_filename}.json"
             
             # Check if file already exists
-            if json_file.exists():
+            if os.path.exists(json_file):
                 print(f"    ⚠️  File {safe_filename}.json already exists")
                 return False
             
@@ -227,17 +232,23 @@ class FileService:
             self.today_processed_dir.mkdir(parents=True, exist_ok=True)
             
             # Create destination path
-            dest_path = self.today_processed_dir / file_path.name
+            dest_name = file_path.name
+            dest_path = f"{self._processed_str}{os.sep}{dest_name}"
             
             # If destination already exists, add timestamp to avoid overwriting
-            if dest_path.exists():
+            if os.path.exists(dest_path):
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                name_parts = dest_path.stem, dest_path.suffix
-                dest_path = self.today_processed_dir / f"{name_parts[0]}_{timestamp}{name_parts[1]}"
+                dest_name = f"{file_path.stem}_{timestamp}{file_path.suffix}"
+                dest_path = f"{self._processed_str}{os.sep}{dest_name}"
             
-            # Move the file
-            shutil.move(str(file_path), str(dest_path))
-            print(f"    📦 Moved to: processed_files/{dest_path.name}")
+            # Move the file - a single rename on the same filesystem
+            try:
+                os.replace(file_path, dest_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(str(file_path), dest_path)
+            print(f"    📦 Moved to: processed_files/{dest_name}")
             return True
             
         except Exception as e:
@@ -0,0 +1,109 @@
+# utils/file_watch.py - File system watching shared by the realtime workers
+"""
+Queues files as the OS reports them, holding back files a writer is still filling
+"""
+import os
+import queue
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List
+from watchdog.observers import Observer
+from watchdog.events import (FileSystemEventHandler, FileClosedEvent, FileClosedNoWriteEvent,
+                             FileCreatedEvent, FileOpenedEvent, FileMovedEvent, DirCreatedEvent)
+
+# Linux reports opens and close-after-write; elsewhere (ReadDirectoryChangesW on Windows) creation
+# events are settled by polling the size. Files moved in from an unwatched folder arrive as creations.
+CLOSE_EVENTS_SUPPORTED = sys.platform.startswith('linux')
+WATCH_EVENT_FILTER = [FileCreatedEvent, FileMovedEvent]
+if CLOSE_EVENTS_SUPPORTED:
+    WATCH_EVENT_FILTER += [FileOpenedEvent, FileClosedEvent, FileClosedNoWriteEvent]
+
+# Seconds for the observer to deliver the open event that follows a creation by a writer
+OPEN_SETTLE_SECONDS = 0.05
+
+def wait_stable(path, interval: float = 0.01, checks: int = 3, timeout: float = 2.0) -> bool:
+    """Wait until a non-empty file's size holds for `checks` polls; False if it disappears"""
+    deadline = time.monotonic() + timeout
+    last, stable = -1, 0
+    while stable < checks and time.monotonic() < deadline:
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            return False
+        if size == last and size > 0:
+            stable += 1
+        else:
+            last, stable = size, 0
+        time.sleep(interval)
+    return True
+
+class NewFileHandler(FileSystemEventHandler):
+    """Queues files that land in the watched folders
+    
+    With include_dirs, new folders are queued too, so the caller can scan files that beat their watch.
+    """
+    
+    def __init__(self, include_dirs: bool = False):
+        self.include_dirs = include_dirs
+        self.pending = queue.Queue()
+        self.open_files = set()  # Linux: files some process has open right now
+    
+    def is_open(self, path: Path) -> bool:
+        """True while a writer may still be filling the file - its close event queues it again"""
+        return str(path) in self.open_files
+    
+    def on_opened(self, event):
+        """File opened (Linux IN_OPEN)"""
+        self.open_files.add(event.src_path)
+    
+    def on_closed(self, event):
+        """Writer closed the file (Linux IN_CLOSE_WRITE) - content is complete"""
+        self.open_files.discard(event.src_path)
+        self.pending.put(Path(event.src_path))
+    
+    def on_closed_no_write(self, event):
+        """Reader closed the file (Linux IN_CLOSE_NOWRITE)"""
+        self.open_files.discard(event.src_path)
+    
+    def on_created(self, event):
+        """File moved in from an unwatched folder, or new file being written (held back while it is open/growing)"""
+        if self.include_dirs or not event.is_directory:
+            self.pending.put(Path(event.src_path))
+    
+    def on_moved(self, event):
+        """File renamed into a watched folder"""
+        if not event.is_directory:
+            self.pending.put(Path(event.dest_path))
+    
+    def wait_for_files(self, timeout: float) -> List[Path]:
+        """Block for the next event, then drain whatever else arrived so bursts are handled as one batch
+        
+        Files still being written are dropped - their close (or next) event queues them again.
+        Returns an empty list when nothing arrives within timeout.
+        """
+        try:
+            paths = [self.pending.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        
+        while True:
+            try:
+                paths.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        
+        if CLOSE_EVENTS_SUPPORTED:
+            time.sleep(OPEN_SETTLE_SECONDS)
+            return [p for p in paths if not self.is_open(p)]
+        return [p for p in paths if p.is_dir() or wait_stable(p)]
+
+def start_observer(handler: NewFileHandler, folders: Iterable[Path], recursive: bool = False) -> Observer:
+    """Create the folders if needed and start one observer watching all of them"""
+    event_filter = WATCH_EVENT_FILTER + [DirCreatedEvent] if handler.include_dirs else WATCH_EVENT_FILTER
+    observer = Observer()
+    for folder in folders:
+        folder.mkdir(parents=True, exist_ok=True)
+        observer.schedule(handler, str(folder), recursive=recursive, event_filter=event_filter)
+    observer.start()
+    return observer
@@ -0,0 +1,34 @@
+# utils/processed_keys.py - Bounded processed-file tracking for the realtime workers
+"""
+Set of processed file keys that forgets the oldest entries past a size cap
+"""
+from collections.abc import MutableSet
+from typing import Any, Dict
+
+class ProcessedFileKeys(MutableSet):
+    """Set of processed file keys that forgets the oldest entries past max_size
+    
+    Only meant for keys of files that are rarely seen again once processed; the cap
+    stops long sessions from growing without bound.
+    """
+    
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._keys: Dict[Any, None] = {}  # Insertion ordered - oldest first
+    
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def add(self, key):
+        self._keys[key] = None
+        if len(self._keys) > self.max_size:
+            del self._keys[next(iter(self._keys))]
+    
+    def discard(self, key):
+        self._keys.pop(key, None)
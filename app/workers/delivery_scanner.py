@@ -1,7 +1,6 @@
 # app/workers/delivery_scanner.py - Enhanced with dual directory monitoring
 import signal
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 
@@ -18,6 +17,7 @@ from config.settings import settings
 from app.services.delivery_scanner.file_service import FileService
 from app.services.delivery_scanner.detection_service import DetectionService
 from app.services.delivery_scanner.processing_service import ProcessingService
+from app.utils.file_watch import NewFileHandler, start_observer
 
 class RealtimeDeliveryScanner:
     """Enhanced delivery scanner with dual directory monitoring"""
@@ -49,9 +49,9 @@ class RealtimeDeliveryScanner:
         print(f"🗑️  Auto-cleanup: Files removed from source after processing")
         
     def run_realtime_monitor(self, check_interval: int = 30):
-        """Enhanced real-time monitoring loop with dual directory support"""
+        """Enhanced real-time monitoring with dual directory support - driven by file system events"""
         print(f"\n🚀 Starting Enhanced Real-time Delivery Receipt Scanner")
-        print(f"⏱️  Check interval: {check_interval} seconds")
+        print(f"⏱️  Event-driven (idle wake-up every {check_interval} seconds)")
         
         # Your FileService now has dual directory support
         if hasattr(self.file_service, 'today_primary_source') and hasattr(self.file_service, 'today_secondary_source'):
@@ -86,37 +86,52 @@ class RealtimeDeliveryScanner:
             else:
                 print(f"   📂 Files processed: {stats['primary_source_processed']}")
                 
+            self.file_service.close_log()
             self.is_running = False
             sys.exit(0)
         
         signal.signal(signal.SIGINT, signal_handler)
         self.is_running = True
         
+        # The OS pushes new files to us; the folders are only rescanned when an interval passes idle
+        # New date folders are queued too - their first files can beat the watch, so they get scanned
+        handler = NewFileHandler(include_dirs=True)
+        observer = start_observer(handler, self.file_service.get_source_roots(), recursive=True)
+        
         try:
+            processed_files = self.processing_service.get_processed_files()
+            
+            # Pick up files that arrived before the observer started
+            print(f"\n🔍 Scanning for existing files... {datetime.now().strftime('%H:%M:%S')}")
+            new_files = self.file_service.scan_for_new_files(processed_files)
+            if new_files:
+                self.processing_service.process_new_files(new_files, self.file_service, self.detection_service)
+                self.file_service.flush_log()
+                self.processing_service.print_session_stats()
+            elif dual_mode:
+                print("📭 No new files to scan in either directory")
+            else:
+                print("📭 No new files to scan")
+            
             while self.is_running:
-                print(f"\n🔍 Scanning for new files... {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Scan for new files from both directories
-                processed_files = self.processing_service.get_processed_files()
-                new_files = self.file_service.scan_for_new_files(processed_files)
-                
+                paths = handler.wait_for_files(check_interval)
+                if paths:
+                    new_files = self.file_service.accept_event_files(paths, processed_files)
+                else:
+                    # Idle wake-up - rescan for files no event reported (new date folders, missed events)
+                    new_files = self.file_service.scan_for_new_files(processed_files)
                 if new_files:
+                    print(f"\n🔔 {len(new_files)} new file(s) detected... {datetime.now().strftime('%H:%M:%S')}")
                     self.processing_service.process_new_files(new_files, self.file_service, self.detection_service)
-                else:
-                    if dual_mode:
-                        print("📭 No new files to scan in either directory")
-                    else:
-                        print("📭 No new files to scan")
-                
-                # Print session stats
-                self.processing_service.print_session_stats()
-                
-                print(f"\n😴 Waiting {check_interval} seconds...")
-                time.sleep(check_interval)
+                    self.file_service.flush_log()
+                    self.processing_service.print_session_stats()
                 
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             raise
+        finally:
+            observer.stop()
+            observer.join()
     
     def scan_all_existing(self):
         """Scan all existing files from both directories"""
@@ -170,7 +185,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Enhanced Real-time Delivery Receipt Scanner with Dual Directory Monitoring")
     parser.add_argument("--interval", type=int, default=30,
-                       help="Check interval in seconds (default: 30)")
+                       help="Idle wake-up interval in seconds while waiting for file events (default: 30)")
     parser.add_argument("--scan-existing", action="store_true",
                        help="Scan all existing files from both directories once and exit")
     parser.add_argument("--summary", action="store_true",
@@ -1,7 +1,6 @@
 # app/workers/ocr_classification.py - Main OCR classification orchestrator (organized from your original)
 import signal
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 
@@ -17,6 +16,7 @@ sys.path.insert(0, str(app_dir))
 from config.settings import settings
 from services.ocr_classification.file_service import FileService
 from services.ocr_classification.processing_service import ProcessingService
+from app.utils.file_watch import NewFileHandler, start_observer
 
 class RealtimeFileClassifier:
     """Main classification orchestrator - organized from your original RealtimeFileClassifier class"""
@@ -35,9 +35,9 @@ class RealtimeFileClassifier:
         print(f"🗓️ Processing files for: {datetime.now().strftime('%Y-%m-%d')}")
         
     def run_realtime_monitor(self, check_interval: int = 10):
-        """Main real-time monitoring loop - exact logic from your original"""
+        """Main real-time monitoring loop - driven by file system events"""
         print(f"\n🚀 Starting Real-time File Classification Monitor")
-        print(f"⏱️  Check interval: {check_interval} seconds")
+        print(f"⏱️  Event-driven (idle wake-up every {check_interval} seconds)")
         print(f"📂 Monitoring: {self.file_service.get_source_directory()}")
         print(f"✅ Files with URLs → {self.file_service.today_url_dir}")
         print(f"📋 Files without URLs → {self.file_service.today_no_url_dir}")
@@ -54,28 +54,44 @@ class RealtimeFileClassifier:
         self.is_running = True
         
         try:
-            while self.is_running:
-                print(f"\n🔍 Scanning for new files... {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Scan for new files
-                processed_files = self.processing_service.get_processed_files()
-                new_files = self.file_service.scan_for_new_files(processed_files)
-                
-                if new_files:
-                    self.processing_service.process_new_files(new_files, self.file_service)
-                else:
-                    print("📭 No new files to classify")
-                
-                # Print session stats - exact format from your original
-                self.processing_service.print_session_stats()
-                
-                print(f"\n😴 Waiting {check_interval} seconds...")
-                time.sleep(check_interval)
+            self._watch_for_new_files(check_interval)
                 
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             raise
     
+    def _watch_for_new_files(self, check_interval: int):
+        """Classify files as the OS reports them instead of rescanning the directory"""
+        handler = NewFileHandler()
+        observer = start_observer(handler, [self.file_service.get_source_directory()])
+        
+        try:
+            processed_files = self.processing_service.get_processed_files()
+            
+            # Pick up files that arrived before the observer started
+            print(f"\n🔍 Scanning for existing files... {datetime.now().strftime('%H:%M:%S')}")
+            new_files = self.file_service.scan_for_new_files(processed_files)
+            if new_files:
+                self.processing_service.process_new_files(new_files, self.file_service)
+            else:
+                print("📭 No new files to classify")
+            self.processing_service.print_session_stats()
+            
+            while self.is_running:
+                paths = handler.wait_for_files(check_interval)
+                if paths:
+                    new_files = self.file_service.accept_event_files(paths, processed_files)
+                else:
+                    # Idle wake-up - rescan for files no event reported (new date folders, missed events)
+                    new_files = self.file_service.scan_for_new_files(processed_files)
+                if new_files:
+                    print(f"\n🔔 {len(new_files)} new file(s) detected... {datetime.now().strftime('%H:%M:%S')}")
+                    self.processing_service.process_new_files(new_files, self.file_service)
+                    self.processing_service.print_session_stats()
+        finally:
+            observer.stop()
+            observer.join()
+    
     def classify_all_existing(self):
         """Classify all existing files once - from your original --classify-existing logic"""
         return self.processing_service.classify_existing_files(self.file_service)
@@ -103,7 +119,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Real-time File Classifier for hddc01 URLs with Date Organization")
     parser.add_argument("--interval", type=int, default=10,
-                       help="Check interval in seconds")
+                       help="Idle wake-up interval in seconds while waiting for file events (default: 10)")
     parser.add_argument("--classify-existing", action="store_true",
                        help="Classify all existing files once and exit")
     parser.add_argument("--summary", action="store_true",
@@ -136,7 +152,7 @@ ORGANIZED REAL-TIME FILE CLASSIFIER WITH DATE ORGANIZATION
 
 USAGE:
 
-1. Start real-time monitoring (default 10-second intervals):
+1. Start real-time monitoring (default 10-second idle wake-up):
    python app/workers/ocr_classification.py
 
 2. Custom monitoring interval:
@@ -187,7 +203,7 @@ FEATURES:
 ✅ Same functionality as original - just organized
 ✅ Date-based folder organization
 ✅ Enhanced classification with today's date tracking
-✅ Real-time monitoring every 10 seconds
+✅ Real-time monitoring - files are classified as soon as they are written (folders are rescanned on each 10-second idle wake-up)
 ✅ Automatic classification based on hddc01 URLs
 ✅ Session-only tracking (no history files)
 ✅ Handles both JSON and non-JSON files
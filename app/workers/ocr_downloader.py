@@ -1,7 +1,10 @@
 # app/workers/ocr_downloader.py - Main OCR downloader orchestrator (organized from your original)
+import atexit
+import logging
+import logging.handlers
+import queue
 import signal
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 
@@ -18,11 +21,30 @@ from config.settings import settings
 from services.ocr_downloader.api_service import APIService
 from services.ocr_downloader.file_service import FileService
 from services.ocr_downloader.processing_service import ProcessingService
+from app.utils.file_watch import NewFileHandler, start_observer
+
+def _configure_queue_logging():
+    """Print-style log output whose stream writes happen on a QueueListener thread"""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    atexit.register(listener.stop)
 
 class RealtimeFileDownloader:
     """Main downloader orchestrator - organized from your original RealtimeFileDownloader class"""
     
     def __init__(self):
+        # Download threads hand their output to one writer thread instead of contending for stdout
+        _configure_queue_logging()
+        self.logger = logging.getLogger(__name__)
+        
         self.api_service = APIService()
         self.file_service = FileService()
         self.processing_service = ProcessingService()
@@ -35,18 +57,27 @@ class RealtimeFileDownloader:
         print(f"💾 Downloads to: {self.file_service.get_download_directory()}")
         print(f"🗓️ Processing files for: {datetime.now().strftime('%Y-%m-%d')}")
         
+        # Skip files an earlier run already finished today
+        restored = self.file_service.load_processed_files()
+        if restored:
+            self.processing_service.get_processed_files().update(restored)
+            print(f"📚 Restored {len(restored)} processed files from earlier runs")
+        
+        # Know which downloads already exist without a stat per file
+        print(f"💾 Found {self.file_service.load_downloaded_names()} files already downloaded today")
+        
     def run_realtime_monitor(self, check_interval: int = 15):
-        """Main real-time monitoring loop - exact logic from your original"""
+        """Main real-time monitoring loop - driven by file system events"""
         print(f"\n🚀 Starting Real-time File Download Monitor")
-        print(f"⏱️  Check interval: {check_interval} seconds")
+        print(f"⏱️  Event-driven (idle wake-up every {check_interval} seconds)")
         print(f"📂 Monitoring: {self.file_service.get_source_directory()}")
         print(f"💾 Downloads to: {self.file_service.get_download_directory()}")
         print(f"💡 Press Ctrl+C to stop")
         print("="*60)
         
         def signal_handler(sig, frame):
-            print(f"\n🛑 Stopping file downloader...")
-            print(f"🗑️ Session data cleared. Goodbye!")
+            self.logger.info(f"\n🛑 Stopping file downloader...")
+            self.logger.info(f"💾 Processed files saved for today. Goodbye!")
             self.is_running = False
             sys.exit(0)
         
@@ -54,28 +85,44 @@ class RealtimeFileDownloader:
         self.is_running = True
         
         try:
-            while self.is_running:
-                print(f"\n🔍 Scanning for new files... {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Scan for new files
-                processed_files = self.processing_service.get_processed_files()
-                new_files = self.file_service.scan_for_new_files(processed_files)
-                
-                if new_files:
-                    self.processing_service.process_new_files(new_files, self.file_service, self.api_service)
-                else:
-                    print("📭 No new files to download")
-                
-                # Print session stats - exact format from your original
-                self.processing_service.print_session_stats()
-                
-                print(f"\n😴 Waiting {check_interval} seconds...")
-                time.sleep(check_interval)
+            self._watch_for_new_files(check_interval)
                 
         except Exception as e:
-            print(f"❌ Unexpected error: {e}")
+            self.logger.error(f"❌ Unexpected error: {e}")
             raise
     
+    def _watch_for_new_files(self, check_interval: int):
+        """Process files as the OS reports them instead of rescanning the directory"""
+        handler = NewFileHandler()
+        observer = start_observer(handler, [self.file_service.get_source_directory()])
+        
+        try:
+            processed_files = self.processing_service.get_processed_files()
+            
+            # Pick up files that arrived before the observer started
+            self.logger.info(f"\n🔍 Scanning for existing files... {datetime.now().strftime('%H:%M:%S')}")
+            new_files = self.file_service.scan_for_new_files(processed_files)
+            if new_files:
+                self.processing_service.process_new_files(new_files, self.file_service, self.api_service)
+            else:
+                self.logger.info("📭 No new files to download")
+            self.processing_service.print_session_stats()
+            
+            while self.is_running:
+                paths = handler.wait_for_files(check_interval)
+                if paths:
+                    new_files = self.file_service.accept_event_files(paths, processed_files)
+                else:
+                    # Idle wake-up - rescan for files no event reported (new date folders, missed events)
+                    new_files = self.file_service.scan_for_new_files(processed_files)
+                if new_files:
+                    self.logger.info(f"\n🔔 {len(new_files)} new file(s) detected... {datetime.now().strftime('%H:%M:%S')}")
+                    self.processing_service.process_new_files(new_files, self.file_service, self.api_service)
+                    self.processing_service.print_session_stats()
+        finally:
+            observer.stop()
+            observer.join()
+    
     def download_all_existing(self):
         """Download all existing files once - from your original --download-existing logic"""
         return self.processing_service.download_existing_files(self.file_service, self.api_service)
@@ -101,7 +148,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Real-time File Downloader for receipt_ocring with Date Organization")
     parser.add_argument("--interval", type=int, default=15,
-                       help="Check interval in seconds")
+                       help="Idle wake-up interval in seconds while waiting for file events (default: 15)")
     parser.add_argument("--download-existing", action="store_true",
                        help="Download all existing files once and exit")
     parser.add_argument("--summary", action="store_true",
@@ -134,7 +181,7 @@ ORGANIZED REAL-TIME FILE DOWNLOADER WITH DATE ORGANIZATION
 
 USAGE:
 
-1. Start real-time monitoring (default 15-second intervals):
+1. Start real-time monitoring (default 15-second idle wake-up):
    python app/workers/ocr_downloader.py
 
 2. Custom monitoring interval:
@@ -190,9 +237,9 @@ C:\\Point Detection\\worker\\data\\
 FEATURES:
 ✅ Same functionality as original - just organized by date
 ✅ Date-based folder organization for easy daily processing
-✅ Real-time monitoring every 15 seconds
+✅ Event-driven monitoring (folders are rescanned on each 15-second idle wake-up)
 ✅ Automatic file type detection from content headers
-✅ Session-only tracking (no history files)
+✅ Processed files remembered for the day across restarts (failed downloads are retried)
 ✅ Smart filename handling using original receipt numbers
 ✅ Handles various image formats and PDFs
 ✅ Error handling and retry logic
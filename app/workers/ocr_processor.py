@@ -1,10 +1,15 @@
 # app/workers/ocr_processor.py - PRODUCTION VERSION (All files, no debug limits)
+import queue
 import signal
 import sys
-import time
+from concurrent.futures import as_completed
 from datetime import datetime
 from pathlib import Path
 
+from watchdog.observers import Observer
+from watchdog.events import (FileSystemEventHandler, FileClosedEvent, FileCreatedEvent,
+                             FileModifiedEvent, FileMovedEvent)
+
 # Add directories to Python path  
 current_dir = Path(__file__).parent  # app/workers/
 app_dir = current_dir.parent         # app/
@@ -18,6 +23,48 @@ from config.settings import settings
 from app.services.ocr_processor.api_service import APIService
 from app.services.ocr_processor.file_service import FileService  
 from app.services.ocr_processor.processing_service import ProcessingService
+from app.utils.file_watch import CLOSE_EVENTS_SUPPORTED
+
+# Linux reports when the detector closes the file it wrote; elsewhere every modification is reported
+if CLOSE_EVENTS_SUPPORTED:
+    WATCH_EVENT_FILTER = [FileClosedEvent, FileMovedEvent]
+else:
+    WATCH_EVENT_FILTER = [FileCreatedEvent, FileModifiedEvent, FileMovedEvent]
+
+# Daily receipts files written by the realtime detector (new and old naming)
+RECEIPTS_FILE_PREFIXES = ("receipts_", "new_receipts_today_")
+
+# Seconds without further events before a burst of writes counts as finished
+EVENT_SETTLE_SECONDS = 0.2
+
+class ReceiptsFileHandler(FileSystemEventHandler):
+    """Signals when the realtime detector writes a receipts JSON file"""
+    
+    def __init__(self, pending: queue.Queue):
+        self.pending = pending
+    
+    def _notify(self, path: str):
+        if Path(path).name.startswith(RECEIPTS_FILE_PREFIXES):
+            self.pending.put(path)
+    
+    def on_closed(self, event):
+        """Writer closed the file (Linux IN_CLOSE_WRITE) - content is complete"""
+        self._notify(event.src_path)
+    
+    def on_created(self, event):
+        """New file in the monitor folder"""
+        if not event.is_directory:
+            self._notify(event.src_path)
+    
+    def on_modified(self, event):
+        """File written to (platforms without close events)"""
+        if not event.is_directory:
+            self._notify(event.src_path)
+    
+    def on_moved(self, event):
+        """File renamed into place"""
+        if not event.is_directory:
+            self._notify(event.dest_path)
 
 class RealtimeOCRProcessor:
     """Main OCR orchestrator - PRODUCTION VERSION"""
@@ -36,6 +83,12 @@ class RealtimeOCRProcessor:
         print(f"📅 Today's OCR folder: {self.file_service.get_today_ocr_directory()}")
         print(f"🗓️ Processing files for: {datetime.now().strftime('%Y-%m-%d')}")
         
+        # Skip receipts an earlier run already downloaded today
+        restored = self.file_service.load_processed_feature_codes()
+        if restored:
+            self.processing_service.processed_feature_codes.update(restored)
+            print(f"📚 Restored {len(restored)} processed featureCodes from earlier runs")
+        
     def process_receipts(self, receipts):
         """Process receipts - handles all receipts efficiently"""
         if not receipts:
@@ -47,6 +100,10 @@ class RealtimeOCRProcessor:
         failed = 0
         already_existed = 0
         
+        # Check and name every receipt here, then download them all at once in worker threads
+        pool = self.processing_service.get_pool()
+        downloads = {}
+        
         for i, receipt in enumerate(receipts, 1):
             # Extract receipt information (handles both old and new formats)
             receipt_number, feature_code, shop_name = self.processing_service.extract_receipt_info(receipt)
@@ -65,29 +122,44 @@ class RealtimeOCRProcessor:
                 failed += 1
                 continue
             
-            # Download file using receipt number as filename
-            file_path, existed = self._download_and_save_file(feature_code, receipt_number)
+            # Fix timestamp format first, then encode - the file is named after the receipt number
+            fixed_number = self.file_service.fix_timestamp_format(str(receipt_number))
+            filename = self.file_service.encode_filename(fixed_number)
+            
+            future = pool.submit(self._download_and_save_file, feature_code, filename)
+            downloads[future] = (i, receipt, receipt_number, feature_code)
+        
+        # Count each download as it finishes
+        finished = []
+        for done, future in enumerate(as_completed(downloads), 1):
+            i, receipt, receipt_number, feature_code = downloads[future]
+            file_path, existed = future.result()
             
             if file_path:
                 if existed:
                     already_existed += 1
                     if i <= 10:  # Only show details for first 10
-                        print(f"    ⏭️  File already exists")
+                        print(f"    ⏭️  File already exists: {receipt_number}")
                 else:
                     successful += 1
                     if i <= 10:  # Only show details for first 10
-                        print(f"    ✅ Downloaded successfully")
+                        print(f"    ✅ Downloaded successfully: {receipt_number}")
                 
                 # Mark featureCode as processed
                 self.processing_service.mark_feature_code_processed(feature_code)
+                finished.append(feature_code)
             else:
                 failed += 1
+                self.processing_service.mark_download_failed(feature_code, receipt)
                 if i <= 10:  # Show errors for first 10
-                    print(f"    ❌ Download failed")
+                    print(f"    ❌ Download failed: {receipt_number}")
             
             # Progress update every 100 files
-            if i % 100 == 0:
-                print(f"📊 Progress: {i}/{len(receipts)} - ✅{successful} ⏭️{already_existed} ❌{failed}")
+            if done % 100 == 0:
+                print(f"📊 Progress: {done}/{len(downloads)} - ✅{successful} ⏭️{already_existed} ❌{failed}")
+        
+        # Failed downloads stay out of the log, so a restart retries them
+        self.file_service.record_processed_feature_codes(finished)
         
         # Update stats and print summary
         self.processing_service.update_processing_stats(len(receipts), successful, failed, already_existed)
@@ -106,8 +178,8 @@ class RealtimeOCRProcessor:
                 for filename in example_files:
                     print(f"       • {filename}")
     
-    def _download_and_save_file(self, feature_code: str, receipt_number: str):
-        """Download and save file - optimized for production"""
+    def _download_and_save_file(self, feature_code: str, filename: str):
+        """Download and save file - runs in a download thread"""
         # Download file content using featureCode
         file_content, content_type = self.api_service.download_receipt_file(feature_code)
         
@@ -117,10 +189,6 @@ class RealtimeOCRProcessor:
         # Get file extension from content type
         ext = settings.ocr_processor.content_types.get(content_type, ".bin")
         
-        # Fix timestamp format first, then encode
-        fixed_number = self.file_service.fix_timestamp_format(str(receipt_number))
-        filename = self.file_service.encode_filename(fixed_number)
-        
         filepath = f"{filename}{ext}"
         full_path = self.file_service.today_ocr_dir / filepath
         
@@ -128,21 +196,24 @@ class RealtimeOCRProcessor:
         if full_path.exists():
             return str(full_path), True  # Return path and "already existed" flag
         
-        # Save file content
+        # Save file content - created exclusively, so when two receipts in a batch share a
+        # number, the thread that loses the race sees the file as already existing
         try:
-            with open(full_path, "wb") as fw:
+            with open(full_path, "xb") as fw:
                 fw.write(file_content)
             
             return str(full_path), False  # Return path and "newly downloaded" flag
             
+        except FileExistsError:
+            return str(full_path), True
         except Exception as e:
             print(f"    ❌ Error saving file: {e}")
             return None, False
     
     def run_realtime_monitor(self, check_interval: int = 15):
-        """Main real-time monitoring loop"""
+        """Main real-time monitoring loop - woken by receipts file changes"""
         print(f"\n🚀 Starting Real-time OCR File Download Monitor")
-        print(f"⏱️  Check interval: {check_interval} seconds")
+        print(f"⏱️  Event-driven (idle check every {check_interval} seconds)")
         print(f"🗓️ REAL-TIME ONLY - Processing today's receipts")
         print(f"💡 Press Ctrl+C to stop")
         print("="*60)
@@ -158,12 +229,19 @@ class RealtimeOCRProcessor:
         signal.signal(signal.SIGINT, signal_handler)
         self.is_running = True
         
+        pending = queue.Queue()
+        settings.OCR_MONITOR_DIR.mkdir(parents=True, exist_ok=True)
+        observer = Observer()
+        observer.schedule(ReceiptsFileHandler(pending), str(settings.OCR_MONITOR_DIR),
+                          recursive=False, event_filter=WATCH_EVENT_FILTER)
+        observer.start()
+        
         try:
             while self.is_running:
                 print(f"\n🔍 Checking for new receipts... {datetime.now().strftime('%H:%M:%S')}")
                 
-                # Load receipts from JSON file
-                all_receipts = self.file_service.load_receipts_from_json()
+                # Receipts added to the JSON file since the last check, plus failed downloads to retry
+                all_receipts = self.processing_service.take_failed_receipts() + self.file_service.load_new_receipts_from_json()
                 
                 # Filter to unprocessed receipts
                 new_receipts = self.processing_service.filter_unprocessed_receipts(all_receipts)
@@ -176,12 +254,28 @@ class RealtimeOCRProcessor:
                 # Print session stats
                 self.processing_service.print_session_stats()
                 
-                print(f"\n😴 Waiting {check_interval} seconds...")
-                time.sleep(check_interval)
+                print(f"\n👀 Waiting for the receipts file to change (up to {check_interval} seconds)...")
+                self._wait_for_change(pending, check_interval)
                 
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             raise
+        finally:
+            observer.stop()
+            observer.join()
+    
+    def _wait_for_change(self, pending: queue.Queue, timeout: int):
+        """Block until a receipts file is written or the timeout passes, then let the burst of writes finish"""
+        try:
+            pending.get(timeout=timeout)
+        except queue.Empty:
+            return  # Idle check - retries failed downloads and covers any missed event
+        
+        while True:
+            try:
+                pending.get(timeout=EVENT_SETTLE_SECONDS)
+            except queue.Empty:
+                return
     
     def process_all_existing(self):
         """Process all existing receipts once"""
@@ -227,7 +321,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Real-time OCR File Downloader")
     parser.add_argument("--interval", type=int, default=15,
-                       help="Check interval in seconds")
+                       help="Idle check interval in seconds while waiting for receipts file changes")
     parser.add_argument("--process-existing", action="store_true",
                        help="Process all existing receipts from today's JSON file once")
     parser.add_argument("--summary", action="store_true",
@@ -23,6 +23,7 @@ from config.settings import settings
 from services.ocr_text_processor.file_service import FileService
 from services.ocr_text_processor.ocr_service import OCRService
 from services.ocr_text_processor.processing_service import ProcessingService
+from app.utils.file_watch import NewFileHandler, start_observer
 
 class RealtimeOCRProcessor:
     """Main OCR text processor orchestrator - organized from your original RealtimeOCRProcessor class"""
@@ -48,9 +49,9 @@ class RealtimeOCRProcessor:
         return True
         
     def run_realtime_monitor(self, check_interval: int = 120):
-        """Main real-time monitoring loop - exact logic from your original"""
+        """Main real-time monitoring loop - driven by file system events"""
         print(f"\n🚀 Starting Real-time OCR Processor")
-        print(f"⏱️  Check interval: {check_interval} seconds")
+        print(f"⏱️  Event-driven (idle wake-up every {check_interval} seconds)")
         print(f"📦 Batch size: {self.processing_service.batch_size} files")
         print(f"⏰ Max batch time: {self.processing_service.max_processing_time} seconds")
         print(f"📂 Monitoring: {self.file_service.get_source_directory()}")
@@ -62,6 +63,7 @@ class RealtimeOCRProcessor:
             print(f"\n🛑 Stopping OCR processor...")
             stats = self.processing_service.get_ocr_stats()
             print(f"📊 Final stats: {stats['total_processed']} files processed")
+            self.ocr_service.close()
             self.is_running = False
             sys.exit(0)
         
@@ -69,36 +71,55 @@ class RealtimeOCRProcessor:
         self.is_running = True
         
         try:
-            while self.is_running:
-                print(f"\n🔍 Scanning for new images... {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Scan for new files
-                processed_files = self.processing_service.get_processed_files()
-                new_files = self.file_service.scan_for_new_files(processed_files)
-                
-                if new_files:
-                    # Process in batches - exactly like your original
-                    for i in range(0, len(new_files), self.processing_service.batch_size):
-                        batch = new_files[i:i + self.processing_service.batch_size]
-                        self.processing_service.process_batch(batch, self.file_service, self.ocr_service)
-                        
-                        # Small break between batches - exactly like your original
-                        if i + self.processing_service.batch_size < len(new_files):
-                            print("😴 Brief pause between batches...")
-                            time.sleep(5)
-                else:
-                    print("📭 No new images to process")
-                
-                # Print session stats - exact format from your original
-                self.processing_service.print_session_stats()
-                
-                print(f"\n😴 Waiting {check_interval} seconds...")
-                time.sleep(check_interval)
+            self._watch_for_new_files(check_interval)
                 
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
             raise
     
+    def _process_new_files(self, new_files):
+        """Process new files in batches - exactly like your original"""
+        for i in range(0, len(new_files), self.processing_service.batch_size):
+            batch = new_files[i:i + self.processing_service.batch_size]
+            self.processing_service.process_batch(batch, self.file_service, self.ocr_service)
+            
+            # Small break between batches - exactly like your original
+            if i + self.processing_service.batch_size < len(new_files):
+                print("😴 Brief pause between batches...")
+                time.sleep(5)
+    
+    def _watch_for_new_files(self, check_interval: int):
+        """Process images as the OS reports them instead of rescanning the directories"""
+        handler = NewFileHandler()
+        observer = start_observer(handler, [self.file_service.get_source_directory()])
+        
+        try:
+            processed_files = self.processing_service.get_processed_files()
+            
+            # Pick up images that arrived before the observer started, in today's and earlier date folders
+            print(f"\n🔍 Scanning for existing images... {datetime.now().strftime('%H:%M:%S')}")
+            new_files = self.file_service.scan_for_new_files(processed_files)
+            if new_files:
+                self._process_new_files(new_files)
+            else:
+                print("📭 No new images to process")
+            self.processing_service.print_session_stats()
+            
+            while self.is_running:
+                paths = handler.wait_for_files(check_interval)
+                if paths:
+                    new_files = self.file_service.accept_event_files(paths, processed_files)
+                else:
+                    # Idle wake-up - rescan for files no event reported (new date folders, missed events)
+                    new_files = self.file_service.scan_for_new_files(processed_files)
+                if new_files:
+                    print(f"\n🔔 {len(new_files)} new image(s) detected... {datetime.now().strftime('%H:%M:%S')}")
+                    self._process_new_files(new_files)
+                    self.processing_service.print_session_stats()
+        finally:
+            observer.stop()
+            observer.join()
+    
     def process_all_existing(self):
         """Process all existing files once - from your original --process-existing logic"""
         return self.processing_service.process_existing_files(self.file_service, self.ocr_service)
@@ -126,7 +147,7 @@ def main():
     
     parser = argparse.ArgumentParser(description="Real-time OCR Processor with Date Organization")
     parser.add_argument("--interval", type=int, default=120,
-                       help="Check interval in seconds (default: 120)")
+                       help="Idle wake-up interval in seconds while waiting for file events (default: 120)")
     parser.add_argument("--batch-size", type=int, default=10,
                        help="Files to process per batch (default: 10)")
     parser.add_argument("--process-existing", action="store_true",
@@ -152,6 +173,7 @@ def main():
         sys.exit(0)
     elif args.process_existing:
         processor.process_all_existing()
+        processor.ocr_service.close()
     else:
         # Start real-time monitoring
         processor.run_realtime_monitor(args.interval)
@@ -168,7 +190,7 @@ ORGANIZED REAL-TIME OCR PROCESSOR WITH DATE ORGANIZATION
 
 USAGE:
 
-1. Start real-time monitoring (default 2-minute intervals):
+1. Start real-time monitoring (default 2-minute idle wake-up):
    python app/workers/ocr_text_processor.py
 
 2. Custom settings:
@@ -185,7 +207,7 @@ PERFORMANCE OPTIMIZATION:
 Your Performance: 100 receipts = 10 minutes (6 seconds/receipt)
 
 Recommended Settings:
-- Check interval: 120 seconds (2 minutes)
+- Idle wake-up: 120 seconds (2 minutes)
 - Batch size: 10 files
 - Max batch time: 300 seconds (5 minutes)
 
@@ -231,7 +253,9 @@ C:\\Point Detection\\worker\\data\\
 FEATURES:
 ✅ Same functionality as original - just organized by date
 ✅ Date-based folder organization for easy daily processing
+✅ Event-driven: images are picked up as soon as they are written (folders are rescanned on each idle wake-up)
 ✅ Smart batching for performance optimization
+✅ OCR spread across one worker process per CPU core
 ✅ Time limits to prevent hanging
 ✅ Performance monitoring and statistics
 ✅ Chinese + English OCR support
@@ -1,7 +1,10 @@
 # app/workers/receipt_matcher.py - FIXED comprehensive receipt matcher
+import json
+import logging
 import signal
 import sys
 import time
+import traceback
 from datetime import datetime
 from pathlib import Path
 
@@ -18,6 +21,21 @@ from config.settings import settings
 from services.receipt_matcher.file_service import FileService
 from services.receipt_matcher.matching_service import MatchingService
 
+logger = logging.getLogger(__name__)
+
+# Receipt file formats accepted by the matcher
+RECEIPT_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.pdf', '.bin', '.bmp', '.json'})
+
+# Cached "YYYY-mm-dd HH:MM:SS" string, refreshed at most once per second
+_now_str_cache = [0, '']
+
+def _now_str() -> str:
+    """Current local time as a string, reused for every call within the same second"""
+    t = int(time.time())
+    if _now_str_cache[0] != t:
+        _now_str_cache[:] = [t, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))]
+    return _now_str_cache[1]
+
 class ProcessingService:
     """Enhanced receipt matcher processing logic - ensures EVERY file is processed"""
     
@@ -71,12 +89,32 @@ class ProcessingService:
         self.stats["total_files_in_directory"] = len(all_files)
         return all_files
     
+    def is_probably_receipt(self, file_path: Path) -> bool:
+        """Stage 1: cheap extension check, no file I/O"""
+        return file_path.suffix.lower() in RECEIPT_EXTENSIONS
+    
+    def validate_receipt_json(self, data, file_path: Path) -> bool:
+        """Stage 2: reject parsed JSON that is an OCR result or an already matched receipt"""
+        if not isinstance(data, dict):
+            return True
+        
+        # Skip obvious OCR files
+        if 'ocr_metadata' in data:
+            print(f"   🚨 SKIPPING OCR FILE: {file_path.name}")
+            return False
+        
+        # Skip already processed files
+        if all(field in data for field in ['number', 'store_name', 'ticketAmount']) and data.get('number') != 'unknown':
+            print(f"   ⏭️  SKIPPING PROCESSED FILE: {file_path.name}")
+            return False
+        
+        return True
+    
     def is_valid_receipt_file(self, file_path: Path) -> bool:
         """Check if this is a valid receipt file to process"""
         
         # Accept common receipt file formats
-        valid_extensions = {'.jpg', '.jpeg', '.png', '.pdf', '.bin', '.bmp', '.json'}
-        if file_path.suffix.lower() not in valid_extensions:
+        if not self.is_probably_receipt(file_path):
             return False
         
         # For JSON files, do basic validation
@@ -84,20 +122,11 @@ class ProcessingService:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                
-                # Skip obvious OCR files
-                if 'ocr_metadata' in data:
-                    print(f"   🚨 SKIPPING OCR FILE: {file_path.name}")
-                    return False
-                
-                # Skip already processed files
-                if all(field in data for field in ['number', 'store_name', 'ticketAmount']) and data.get('number') != 'unknown':
-                    print(f"   ⏭️  SKIPPING PROCESSED FILE: {file_path.name}")
-                    return False
-                    
             except Exception:
                 # If we can't read the JSON, still try to process it
-                pass
+                return True
+            
+            return self.validate_receipt_json(data, file_path)
         
         return True
     
@@ -110,7 +139,7 @@ class ProcessingService:
             if not self.is_valid_receipt_file(file_path):
                 print(f"   ⏭️  SKIPPED: Not a valid receipt file")
                 self.stats["invalid_files_skipped"] += 1
-                return None
+                return {'skipped': True}
             
             # Extract number from filename
             number = file_service.extract_number_from_filename(file_path)
@@ -118,7 +147,7 @@ class ProcessingService:
             if not number:
                 print(f"   ⚠️  NO NUMBER: Could not extract receipt number from filename")
                 self.stats["files_without_numbers"] += 1
-                return None
+                return {'skipped': True}
             
             print(f"   🔢 EXTRACTED NUMBER: '{number}'")
             
@@ -147,7 +176,7 @@ class ProcessingService:
                 
                 # Add metadata to track this came from receipt matcher
                 receipt_fields['_matched_by'] = 'receipt_matcher'
-                receipt_fields['_matched_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                receipt_fields['_matched_at'] = _now_str()
                 receipt_fields['_original_file'] = file_path.name
                 
                 # Save individual JSON file
@@ -165,10 +194,14 @@ class ProcessingService:
                 print(f"   ❌ NO MATCH: No response found for number '{number}'")
                 return None
                 
+        except FileNotFoundError as e:
+            # Expected for files already moved by an earlier pass - no stack needed
+            print(f"   ⚠️  SKIPPED: {type(e).__name__}: {e}")
+            return None
         except Exception as e:
             print(f"   💥 ERROR: Exception during processing: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            if logger.isEnabledFor(logging.DEBUG):
+                traceback.print_exc()
             return None
     
     def process_all_files_comprehensive(self, response_map: dict, file_service, matching_service) -> int:
@@ -184,16 +217,32 @@ class ProcessingService:
         print(f"\n🎯 PROCESSING ALL FILES: {len(all_files)} files found")
         print("="*80)
         
+        # Stage 1: drop non-receipt files up front, counted in one aggregate update
+        candidates, rejected = [], []
+        for file_path in all_files:
+            if self.is_probably_receipt(file_path):
+                candidates.append(file_path)
+            else:
+                rejected.append(str(file_path))
+        if rejected:
+            print(f"⏭️  PRE-FILTER: {len(rejected)} non-receipt files skipped")
+            self.all_files_seen.update(rejected)
+            self.processed_files.update(rejected)
+            self.stats["invalid_files_skipped"] += len(rejected)
+            self.stats["total_processed"] += len(rejected)
+        
         matched_count = 0
         unmatched_count = 0
-        skipped_count = 0
+        skipped_count = len(rejected)
         error_count = 0
         
-        for i, file_path in enumerate(all_files, 1):
-            print(f"\n📄 [{i}/{len(all_files)}] FILE: {file_path.name}")
+        # Stage 2: parse + match the survivors
+        for i, file_path in enumerate(candidates, 1):
+            print(f"\n📄 [{i}/{len(candidates)}] FILE: {file_path.name}")
+            sp = str(file_path)
             
             # Track that we've seen this file
-            self.all_files_seen.add(str(file_path))
+            self.all_files_seen.add(sp)
             
             try:
                 matched_data = self.process_single_file(file_path, response_map, file_service, matching_service)
@@ -202,7 +251,7 @@ class ProcessingService:
                     matched_count += 1
                     self.stats["total_matched"] += 1
                     print(f"   🟢 RESULT: MATCHED")
-                elif self.stats["invalid_files_skipped"] > 0 or self.stats["files_without_numbers"] > 0:
+                elif matched_data and matched_data.get('skipped'):
                     skipped_count += 1
                     print(f"   🟡 RESULT: SKIPPED")
                 else:
@@ -215,7 +264,7 @@ class ProcessingService:
                 print(f"   💥 RESULT: ERROR - {e}")
             
             # Mark as processed
-            self.processed_files.add(str(file_path))
+            self.processed_files.add(sp)
             self.stats["total_processed"] += 1
         
         # Print comprehensive summary
@@ -387,7 +436,8 @@ class ComprehensiveReceiptMatcher:
                 all_files = self.processing_service.comprehensive_file_scan(self.file_service)
                 
                 # Filter out already processed files
-                new_files = [f for f in all_files if str(f) not in self.processing_service.get_processed_files()]
+                seen = self.processing_service.get_processed_files()
+                new_files = [f for f in all_files if str(f) not in seen]
                 
                 if new_files:
                     print(f"\n🎯 Found {len(new_files)} NEW files to process...")
@@ -397,6 +447,7 @@ class ComprehensiveReceiptMatcher:
                     
                     for i, file_path in enumerate(new_files, 1):
                         print(f"\n📄 [{i}/{len(new_files)}] PROCESSING: {file_path.name}")
+                        sp = str(file_path)
                         
                         try:
                             matched_data = self.processing_service.process_single_file(
@@ -416,7 +467,7 @@ class ComprehensiveReceiptMatcher:
                             print(f"   💥 ERROR: {e}")
                         
                         # Mark as processed
-                        self.processing_service.processed_files.add(str(file_path))
+                        self.processing_service.processed_files.add(sp)
                         self.processing_service.stats["total_processed"] += 1
                     
                     if matched_count > 0 or unmatched_count > 0:
@@ -438,7 +489,6 @@ class ComprehensiveReceiptMatcher:
                 
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
-            import traceback
             traceback.print_exc()
             raise
     
@@ -477,9 +527,16 @@ def main():
                        help="Show comprehensive matching summary and exit")
     parser.add_argument("--realtime", action="store_true",
                        help="Start comprehensive real-time monitoring")
+    parser.add_argument("--debug", action="store_true",
+                       help="Print full tracebacks for per-file errors")
     
     args = parser.parse_args()
     
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    
     # Initialize comprehensive matcher
     matcher = ComprehensiveReceiptMatcher()
     matcher.initialize()
@@ -1,15 +1,27 @@
 # app/workers/focused_timezone_worker.py - FIXED with relaxed validation and format conversion
+import atexit
 import os
 import sys
+import errno
+import shutil
 import time
+import functools
 import json
+import mmap
+import queue
+import re
 import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import orjson
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import FileSystemEventHandler, FileClosedEvent, FileCreatedEvent, FileMovedEvent
 import logging
+import logging.handlers
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,32 +35,145 @@ project_root = app_dir.parent        # C:\Point Detection
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(app_dir))
 
+from app.utils.file_watch import CLOSE_EVENTS_SUPPORTED, wait_stable
+
+# inotify reports IN_CLOSE_WRITE, so on Linux a file is handled exactly once, after its writer is done.
+# Other platforms have no close event and fall back to creation events plus a write-settle delay.
+WATCH_EVENT_FILTER = [FileClosedEvent if CLOSE_EVENTS_SUPPORTED else FileCreatedEvent, FileMovedEvent]
+
+# Files prefetched per batch when draining the existing backlog - every buffer in a batch is
+# held at once, so this stays small enough for a batch of large files to fit in a few MB
+IO_BATCH_SIZE = 64
+
+def _write_file_bytes(path, data: bytes):
+    """Write a whole file straight from one bytes object, bypassing the buffered IO layer"""
+    fd = os.open(path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+# Files above this size get the OCR byte screen over an mmap before being read into memory
+MMAP_SCREEN_THRESHOLD = 16 * 1024
+
+def _read_unless_ocr(path) -> Optional[bytes]:
+    """Read a whole file with a single open/fstat/read/close, returning None when a large file is OCR output"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        size = os.fstat(fd).st_size
+        if size > MMAP_SCREEN_THRESHOLD:
+            # Scan page-cached memory directly so mis-routed OCR blobs are never copied
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+                if mm.find(_OCR_METADATA_KEY) != -1 or _DATA_STRING_RE.search(mm):
+                    return None
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+# Every accepted receipt timestamp layout as one alternation, matched in a single pass.
+# Each branch is an outer named group; m.lastgroup names the branch and m.lastindex is
+# its group number, so the branch's fields follow it in m.groups().
+#   stamp:   %Y-%m-%d %H:%M:%S[.%f], %Y-%m-%dT%H:%M:%S[.%f|Z]
+#   compact: %Y%m%d_%H%M%S
+#   date:    %Y-%m-%d                                     (date folder only)
+#   slash:   %m/%d/%Y %H:%M:%S, then %d/%m/%Y %H:%M:%S   (date folder only)
+_TIME_RE = re.compile(
+    r'(?P<stamp>(\d{4})-(\d{1,2})-(\d{1,2})[ T](\d{1,2}):(\d{1,2}):(\d{1,2})(?:\.(\d{1,6}))?Z?)'
+    r'|(?P<compact>(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2}))'
+    r'|(?P<date>(\d{4})-(\d{1,2})-(\d{1,2}))'
+    r'|(?P<slash>(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}):(\d{1,2}):(\d{1,2}))'
+)
+_FOLDER_ONLY_LAYOUTS = frozenset({'date', 'slash'})
+
+# Top-level keys that mark OCR output; the processing keys together count as one indicator
+_OCR_FLAG_KEYS = frozenset({'ocr_metadata', 'message', 'fields', 'total'})
+_OCR_PROCESSING_KEYS = frozenset({'processed_at', 'processing_time', 'source_file', 'confidence', 'language'})
+
+# Raw-byte markers checked before a file is parsed
+_OCR_METADATA_KEY = b'"ocr_metadata"'
+_TIMEZONE_CONVERSION_KEY = b'"timezone_conversion"'
+_DATA_STRING_RE = re.compile(rb'"data"\s*:\s*"')
+
+def _parse_time(value: str, for_folder: bool = False) -> Optional[datetime]:
+    """Parse a receipt timestamp with one regex match; for_folder also accepts the looser layouts"""
+    m = _TIME_RE.fullmatch(value)
+    if not m or (m.lastgroup in _FOLDER_ONLY_LAYOUTS and not for_folder):
+        return None
+    
+    layout = m.lastgroup
+    fields = m.groups()[m.lastindex:]
+    try:
+        if layout == 'date':
+            return datetime(int(fields[0]), int(fields[1]), int(fields[2]))
+        if layout == 'slash':
+            first, second, year, hh, mm, ss = map(int, fields[:6])
+            try:
+                return datetime(year, first, second, hh, mm, ss)
+            except ValueError:
+                return datetime(year, second, first, hh, mm, ss)
+        micro = fields[6] if layout == 'stamp' else None
+        return datetime(int(fields[0]), int(fields[1]), int(fields[2]),
+                        int(fields[3]), int(fields[4]), int(fields[5]),
+                        int((micro or '0').ljust(6, '0')))
+    except ValueError:
+        return None
+
+def _scan_json_files(root: str):
+    """Yield paths (as str) of all .json files under root using os.scandir"""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.json'):
+                    yield entry.path
+
+def _loads_json(buf: bytes) -> Any:
+    """Parse raw JSON bytes with orjson, falling back to stdlib json for inputs orjson rejects"""
+    try:
+        return orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        return json.loads(buf.decode('utf-8'))
+
+def _dumps_json(data: Any) -> bytes:
+    """Serialize to indented UTF-8 JSON bytes (same layout as json.dump indent=2, ensure_ascii=False)"""
+    try:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Standard field -> accepted source field names, in priority order
+_FIELD_MAPPINGS = (
+    ('number', ('number', 'receipt_number', 'receiptNumber', 'ticket_number', 'id')),
+    ('store_name', ('store_name', 'storeName', 'shop_name', 'shopName', 'merchant_name')),
+    ('store_id', ('store_id', 'storeId', 'shop_code', 'shopCode', 'merchant_id')),
+    ('ticketAmount', ('ticketAmount', 'totalAmount', 'total_amount', 'total', 'amount')),
+    ('print_time', ('print_time', 'printTime', 'timestamp', 'dateTime', 'created_at'))
+)
+_CONVERTED_TEMPLATE = dict.fromkeys((field for field, _ in _FIELD_MAPPINGS), 'unknown')
+_PLACEHOLDER_STRINGS = frozenset({'', 'unknown', 'null'})
+_MISSING = object()
+
 # Simple built-in format converter (no external dependencies)
 def simple_format_converter(data: Dict) -> Optional[Dict]:
     """Simple built-in format converter for common receipt field variations"""
     
-    # Field mapping for common variations
-    field_mappings = {
-        'number': ['number', 'receipt_number', 'receiptNumber', 'ticket_number', 'id'],
-        'store_name': ['store_name', 'storeName', 'shop_name', 'shopName', 'merchant_name'],
-        'store_id': ['store_id', 'storeId', 'shop_code', 'shopCode', 'merchant_id'],
-        'ticketAmount': ['ticketAmount', 'totalAmount', 'total_amount', 'total', 'amount'],
-        'print_time': ['print_time', 'printTime', 'timestamp', 'dateTime', 'created_at']
-    }
-    
-    converted = {}
+    converted = _CONVERTED_TEMPLATE.copy()
     conversion_made = False
     
     # Try to map each standard field
-    for standard_field, variants in field_mappings.items():
-        converted[standard_field] = 'unknown'
-        
+    for standard_field, variants in _FIELD_MAPPINGS:
         for variant in variants:
-            if variant in data and data[variant] not in [None, '', 'unknown', 'null']:
-                converted[standard_field] = data[variant]
-                if variant != standard_field:  # Only count if we actually converted something
-                    conversion_made = True
-                break
+            value = data.get(variant, _MISSING)
+            if value is _MISSING or value is None or (isinstance(value, str) and value in _PLACEHOLDER_STRINGS):
+                continue
+            converted[standard_field] = value
+            if variant != standard_field:  # Only count if we actually converted something
+                conversion_made = True
+            break
     
     # Check if we have enough valid fields
     valid_fields = sum(1 for v in converted.values() if v != 'unknown')
@@ -59,40 +184,76 @@ def simple_format_converter(data: Dict) -> Optional[Dict]:
     
     return None
 
+def _configure_queue_logging():
+    """basicConfig equivalent whose stream writes happen on a QueueListener thread"""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    atexit.register(listener.stop)
+
+class _StatCounters:
+    """Statistics counters kept per thread and summed on read, so pool threads never contend on increments"""
+    
+    def __init__(self, names):
+        self._names = tuple(names)
+        self._local = threading.local()
+        self._thread_counters = []
+        self._lock = threading.Lock()  # Only taken when a new thread registers and on reads
+    
+    def inc(self, name: str, n: int = 1):
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = dict.fromkeys(self._names, 0)
+            with self._lock:
+                self._thread_counters.append(counters)
+        counters[name] += n
+    
+    def __getitem__(self, name: str) -> int:
+        with self._lock:
+            return sum(counters[name] for counters in self._thread_counters)
+
 class FocusedTimezoneHandler(FileSystemEventHandler):
     """Focused file handler - ONLY for matched_non_delivery files"""
     
     def __init__(self, processor):
         self.processor = processor
         self.logger = logging.getLogger(f"{__name__}.FocusedTimezoneHandler")
+    
+    def _dispatch(self, src_path: str, label: str, settle: bool):
+        """Hand a finished JSON file to the processor"""
+        if not src_path.endswith('.json'):
+            return
+        file_path = Path(src_path)
         
+        # SECURITY CHECK: Ensure file is from matched_non_delivery
+        if not self.processor.is_under_watch(file_path):
+            self.logger.warning(f"🚨 BLOCKED: File not from matched_non_delivery: {file_path}")
+            return
+        
+        self.logger.info(f"{label}: {file_path.name}")
+        self.processor.submit_file(file_path, settle)
+    
+    def on_closed(self, event):
+        """Handle writer closing the file (Linux IN_CLOSE_WRITE) - content is complete"""
+        if not event.is_directory:
+            self._dispatch(event.src_path, "📥 New matched file written", settle=False)
+    
     def on_created(self, event):
-        """Handle new file creation events"""
-        if not event.is_directory and event.src_path.endswith('.json'):
-            file_path = Path(event.src_path)
-            
-            # SECURITY CHECK: Ensure file is from matched_non_delivery
-            if "matched_non_delivery" not in str(file_path):
-                self.logger.warning(f"🚨 BLOCKED: File not from matched_non_delivery: {file_path}")
-                return
-                
-            self.logger.info(f"📥 New matched file detected: {file_path.name}")
-            time.sleep(0.2)  # Small delay to ensure file is fully written
-            self.processor.process_matched_file(file_path)
-    
-    def on_modified(self, event):
-        """Handle file modification events"""
-        if not event.is_directory and event.src_path.endswith('.json'):
-            file_path = Path(event.src_path)
-            
-            # SECURITY CHECK: Ensure file is from matched_non_delivery
-            if "matched_non_delivery" not in str(file_path):
-                self.logger.warning(f"🚨 BLOCKED: File not from matched_non_delivery: {file_path}")
-                return
-                
-            self.logger.info(f"📝 Matched file modified: {file_path.name}")
-            time.sleep(0.2)
-            self.processor.process_matched_file(file_path)
+        """Handle new file creation events (platforms without close events)"""
+        if not event.is_directory and not CLOSE_EVENTS_SUPPORTED:
+            self._dispatch(event.src_path, "📥 New matched file detected", settle=True)
+    
+    def on_moved(self, event):
+        """Handle files renamed into the watch tree - the rename makes them complete"""
+        if not event.is_directory:
+            self._dispatch(event.dest_path, "📥 Matched file moved in", settle=False)
 
 class FocusedTimezoneWorker:
     """Focused Timezone Worker - ONLY processes matched_non_delivery files"""
@@ -102,26 +263,37 @@ class FocusedTimezoneWorker:
         self.watch_dir = project_root / "worker" / "data" / "matched_non_delivery"
         self.output_dir = project_root / "worker" / "data" / "converted_tz"
         
+        # Resolved watch root for source checks; date-folder parents repeat, so cache per parent
+        self._watch_root = self.watch_dir.resolve()
+        self._parent_under_watch = functools.lru_cache(maxsize=1024)(self._resolve_under_watch)
+        
         # Components
         self.observer = None
         self.is_running = False
         
+        # Watcher events are queued and processed concurrently so file I/O overlaps
+        self._queue = queue.Queue(maxsize=10_000)
+        self._pool = ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2),
+                                        thread_name_prefix="tz-worker")
+        self._dispatcher = None
+        self._in_flight = set()  # Paths currently being processed
+        self._in_flight_lock = threading.Lock()
+        self._today_cache = (float('-inf'), '')  # (monotonic time, 'YYYY-MM-DD') for _today_str
+        self._ensured_dirs = set()  # Date folders already created this run
+        
         # Statistics
-        self.stats = {
-            'processed': 0, 
-            'failed': 0,
-            'blocked_files': 0,  # Files from wrong directories
-            'already_converted_skipped': 0,  # Track already converted files
-            'format_converted': 0,  # Track files that needed format conversion
-            'ocr_files_moved': 0,  # NEW: Track OCR files moved back to non_delivery
-            'start_time': datetime.now()
-        }
-        
-        # Setup logging
-        logging.basicConfig(
-            level=logging.INFO, 
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        self.stats = _StatCounters((
+            'processed',
+            'failed',
+            'blocked_files',  # Files from wrong directories
+            'already_converted_skipped',  # Track already converted files
+            'format_converted',  # Track files that needed format conversion
+            'ocr_files_moved'  # NEW: Track OCR files moved back to non_delivery
+        ))
+        self.start_time = datetime.now()
+        
+        # Setup logging - records are queued and written by a background listener thread
+        _configure_queue_logging()
         self.logger = logging.getLogger(__name__)
         
         self._initialize()
@@ -146,10 +318,75 @@ class FocusedTimezoneWorker:
             
         self.logger.info("✅ Focused Timezone Worker initialized")
     
+    def _ensure_dir(self, d: Path):
+        """mkdir a date folder the first time it is seen, skipping the syscall afterwards"""
+        if d not in self._ensured_dirs:
+            d.mkdir(parents=True, exist_ok=True)
+            self._ensured_dirs.add(d)
+    
+    def _forget_dir(self, d: Path):
+        """Drop a date folder that vanished mid-run, so the next write to it creates it again"""
+        self._ensured_dirs.discard(d)
+    
+    def _today_str(self) -> str:
+        """Today's date folder name, re-formatted at most once per second"""
+        now = time.monotonic()
+        ts, today = self._today_cache
+        if now - ts > 1.0:
+            today = datetime.now().strftime('%Y-%m-%d')
+            self._today_cache = (now, today)
+        return today
+    
+    def _inc_stat(self, key: str):
+        """Increment a counter - safe from pool threads"""
+        self.stats.inc(key)
+    
+    def submit_file(self, file_path: Path, settle: bool = False):
+        """Queue a file from the watcher for the worker pool"""
+        try:
+            self._queue.put_nowait((file_path, settle))
+        except queue.Full:
+            self.logger.warning(f"⚠️  Queue full, processing inline: {file_path.name}")
+            self._process_queued(file_path, settle)
+    
+    def _dispatch_loop(self):
+        """Move queued files onto the worker pool until monitoring stops"""
+        while self.is_running:
+            try:
+                file_path, settle = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._pool.submit(self._process_queued, file_path, settle)
+    
+    def _process_queued(self, file_path: Path, settle: bool) -> bool:
+        """Pool task - skip files another thread is already handling"""
+        key = str(file_path)
+        with self._in_flight_lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+        try:
+            if settle and not wait_stable(file_path):
+                return False  # Removed while still being written
+            return self.process_matched_file(file_path)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(key)
+    
+    def _resolve_under_watch(self, parent: Path) -> bool:
+        return parent.resolve().is_relative_to(self._watch_root)
+    
+    def is_under_watch(self, file_path: Path) -> bool:
+        """True when the file really lives inside matched_non_delivery (not just has it in its name)"""
+        try:
+            return self._parent_under_watch(file_path.parent)
+        except (OSError, RuntimeError):
+            return False
+    
     def validate_file_source(self, file_path: Path) -> bool:
         """Validate that file is from matched_non_delivery"""
-        if "matched_non_delivery" not in str(file_path):
-            self.stats['blocked_files'] += 1
+        if not self.is_under_watch(file_path):
+            self._inc_stat('blocked_files')
             self.logger.error(f"🚨 SECURITY VIOLATION: Attempted to process file not from matched_non_delivery: {file_path}")
             return False
         return True
@@ -157,42 +394,53 @@ class FocusedTimezoneWorker:
     def detect_and_move_ocr_file(self, data: Dict, file_path: Path) -> bool:
         """Enhanced OCR detection and automatic file moving"""
         
-        # Enhanced OCR detection for multiple OCR formats
-        ocr_indicators = {
-            'has_ocr_metadata': 'ocr_metadata' in data,
-            'has_success_field': 'success' in data and isinstance(data.get('success'), bool),
-            'has_message_field': 'message' in data,
-            'has_fields_field': 'fields' in data,
-            'has_total_field': 'total' in data,
-            'has_large_data_field': 'data' in data and isinstance(data.get('data'), str) and len(data.get('data', '')) > 200,
-            'has_chinese_text': 'data' in data and isinstance(data.get('data'), str) and self._contains_chinese_text(data.get('data', '')),
-            'has_processing_metadata': any(key in data for key in ['processed_at', 'processing_time', 'source_file', 'confidence', 'language'])
-        }
+        # Enhanced OCR detection for multiple OCR formats - key checks in one set intersection
+        keys = data.keys()
+        flag_hits = keys & _OCR_FLAG_KEYS
+        has_processing_metadata = not _OCR_PROCESSING_KEYS.isdisjoint(keys)
+        text = data.get('data')
+        has_text = isinstance(text, str)
+        has_success_field = isinstance(data.get('success'), bool)
+        has_large_data_field = has_text and len(text) > 200
         
         # Count OCR indicators
-        ocr_count = sum(1 for indicator in ocr_indicators.values() if indicator)
+        ocr_count = len(flag_hits) + has_processing_metadata + has_success_field + has_large_data_field
+        
+        # The Chinese-text scan only matters once two other indicators are present
+        has_chinese_text = ocr_count >= 2 and has_text and self._contains_chinese_text(text)
+        ocr_count += has_chinese_text
         
         # If it has 3+ OCR indicators, it's definitely an OCR file
         if ocr_count >= 3:
-            print(f"   🚨 OCR FILE DETECTED: {file_path.name}")
-            print(f"      Indicators found: {ocr_count}/8")
+            self.logger.info(f"   🚨 OCR FILE DETECTED: {file_path.name}")
+            self.logger.info(f"      Indicators found: {ocr_count}/8")
             
             # Log specific indicators found
+            ocr_indicators = {
+                'has_ocr_metadata': 'ocr_metadata' in flag_hits,
+                'has_success_field': has_success_field,
+                'has_message_field': 'message' in flag_hits,
+                'has_fields_field': 'fields' in flag_hits,
+                'has_total_field': 'total' in flag_hits,
+                'has_large_data_field': has_large_data_field,
+                'has_chinese_text': has_chinese_text,
+                'has_processing_metadata': has_processing_metadata
+            }
             found_indicators = [name for name, found in ocr_indicators.items() if found]
-            print(f"      Details: {', '.join(found_indicators)}")
+            self.logger.info(f"      Details: {', '.join(found_indicators)}")
             
             # Show sample of OCR data for confirmation
             if 'data' in data and isinstance(data['data'], str):
                 sample_text = data['data'][:100].replace('\r\n', ' ').replace('\n', ' ')
-                print(f"      Sample text: {sample_text}...")
+                self.logger.info(f"      Sample text: {sample_text}...")
             
             # Move file back to non_delivery
             if self.move_file_to_non_delivery(file_path):
-                self.stats['ocr_files_moved'] += 1
-                print(f"   ↩️  MOVED: File moved back to non_delivery folder")
+                self._inc_stat('ocr_files_moved')
+                self.logger.info(f"   ↩️  MOVED: File moved back to non_delivery folder")
                 return True
             else:
-                print(f"   ❌ FAILED: Could not move file to non_delivery")
+                self.logger.error(f"   ❌ FAILED: Could not move file to non_delivery")
                 return False
         
         return False
@@ -202,15 +450,10 @@ class FocusedTimezoneWorker:
         if not text:
             return False
         
-        # Check for Chinese characters (CJK unified ideographs)
-        chinese_chars = 0
-        for char in text[:200]:  # Check first 200 characters for performance
-            if '\u4e00' <= char <= '\u9fff':  # Chinese character range
-                chinese_chars += 1
-                if chinese_chars >= 5:  # If we find 5+ Chinese chars, it's likely OCR
-                    return True
-        
-        return False
+        # CJK unified ideographs encode to 3 UTF-8 bytes led by 0xE4-0xE9, so counting
+        # those lead bytes in the first 200 characters is one vectorized compare
+        raw = np.frombuffer(text[:200].encode('utf-8', 'ignore'), dtype=np.uint8)
+        return int(((raw >= 0xE4) & (raw <= 0xE9)).sum()) >= 5  # 5+ Chinese chars - likely OCR
     
     def move_file_to_non_delivery(self, file_path: Path) -> bool:
         """Move OCR file back to non_delivery folder with enhanced error handling"""
@@ -219,36 +462,70 @@ class FocusedTimezoneWorker:
             if file_path.parent.name.count('-') == 2:  # YYYY-MM-DD format
                 date_folder = file_path.parent.name
             else:
-                date_folder = datetime.now().strftime('%Y-%m-%d')
+                date_folder = self._today_str()
             
             # Create non_delivery path
             non_delivery_dir = project_root / "worker" / "data" / "non_delivery" / date_folder
-            non_delivery_dir.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(non_delivery_dir)
             
-            # Create destination path
+            # Create destination path - no placeholder file, the receipt matcher scans this folder
             dest_path = non_delivery_dir / file_path.name
-            
-            # Handle duplicate filenames
             if dest_path.exists():
+                # Handle duplicate filenames
                 timestamp = datetime.now().strftime("%H%M%S%f")[:9]
                 stem = file_path.stem
                 suffix = file_path.suffix
                 dest_path = non_delivery_dir / f"{stem}_ocr_moved_{timestamp}{suffix}"
             
-            # Move the file using shutil
-            import shutil
-            shutil.move(str(file_path), str(dest_path))
-            
-            print(f"      📂 Moved to: {dest_path}")
-            print(f"      🎯 Destination: non_delivery/{date_folder}/")
+            # Move the file - a single atomic rename on the same filesystem
+            try:
+                os.replace(file_path, dest_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    if isinstance(e, FileNotFoundError):
+                        self._forget_dir(non_delivery_dir)
+                    raise
+                shutil.move(str(file_path), str(dest_path))
+            
+            self.logger.info(f"      📂 Moved to: {dest_path}")
+            self.logger.info(f"      🎯 Destination: non_delivery/{date_folder}/")
             return True
             
         except Exception as e:
             self.logger.error(f"Error moving OCR file to non_delivery: {e}")
-            print(f"      💥 Move failed: {e}")
+            self.logger.error(f"      💥 Move failed: {e}")
             return False
+    def move_raw_ocr_file(self, file_path: Path):
+        """Move a file flagged as OCR output by the byte screen back to non_delivery"""
+        self.logger.info(f"   🚨 OCR FILE DETECTED (pre-parse): {file_path.name}")
+        if self.move_file_to_non_delivery(file_path):
+            self._inc_stat('ocr_files_moved')
+            self.logger.info(f"   ↩️  MOVED: File moved back to non_delivery folder")
+        else:
+            self.logger.error(f"   ❌ FAILED: Could not move file to non_delivery")
+    
+    def screen_raw_json(self, buf: bytes, file_path: Path) -> bool:
+        """Pre-parse screen on raw bytes - True when the file was handled and must not be parsed"""
+        
+        # OCR output: has ocr_metadata, or a long file with a string 'data' field
+        if _OCR_METADATA_KEY in buf or (len(buf) > 500 and _DATA_STRING_RE.search(buf)):
+            self.move_raw_ocr_file(file_path)
+            return True
+        
+        # Already converted by an earlier run
+        if _TIMEZONE_CONVERSION_KEY in buf:
+            self.logger.info(f"⏭️  ALREADY CONVERTED: File contains 'timezone_conversion' field")
+            self._inc_stat('already_converted_skipped')
+            return True
+        
+        return False
+    
     def validate_and_convert_format(self, data: Dict, file_path: Path) -> Optional[Dict]:
-        """Validate file content and convert format if needed"""
+        """Validate file content and convert format if needed
+        
+        The returned dict is either the freshly parsed input or a newly built one, never shared,
+        so callers may mutate it.
+        """
         
         # CHECK 1: Detect and move OCR files FIRST
         if self.detect_and_move_ocr_file(data, file_path):
@@ -266,7 +543,7 @@ class FocusedTimezoneWorker:
         for indicator in timezone_indicators:
             if indicator in data:
                 self.logger.info(f"⏭️  ALREADY CONVERTED: File contains '{indicator}' field")
-                self.stats['already_converted_skipped'] += 1
+                self._inc_stat('already_converted_skipped')
                 return None
         
         # CHECK 3: Additional OCR blocking (fallback)
@@ -283,15 +560,15 @@ class FocusedTimezoneWorker:
             return data  # Already in correct format
         
         # CHECK 5: Attempt simple format conversion
-        print(f"   📝 Attempting format conversion for: {file_path.name}")
+        self.logger.info(f"   📝 Attempting format conversion for: {file_path.name}")
         converted_data = simple_format_converter(data)
         
         if converted_data:
-            self.stats['format_converted'] += 1
-            print(f"   ✅ Successfully converted to standard format")
+            self._inc_stat('format_converted')
+            self.logger.info(f"   ✅ Successfully converted to standard format")
             return converted_data
         else:
-            print(f"   ❌ Format conversion failed")
+            self.logger.error(f"   ❌ Format conversion failed")
         
         # CHECK 6: Final validation - reject if can't convert
         self.logger.warning(f"⚠️  File does not have valid receipt format: {file_path.name}")
@@ -338,183 +615,137 @@ class FocusedTimezoneWorker:
         
         return 'unknown'
     
-    def process_matched_file(self, file_path: Path) -> bool:
-        """Process a single MATCHED file (clean data only) with race condition protection"""
+    def process_matched_file(self, file_path: Path, buf: Optional[bytes] = None) -> bool:
+        """Process a single MATCHED file (clean data only) with race condition protection
+        
+        buf may carry the file's bytes when they were already prefetched by process_existing_files.
+        """
         try:
-            # CRITICAL: Check if file still exists before processing
-            if not file_path.exists():
-                print(f"⚠️  FILE MISSING: {file_path.name} no longer exists (already processed)")
-                return False
-            
             # SECURITY CHECK 1: Validate file source
             if not self.validate_file_source(file_path):
                 return False
             
-            # CRITICAL: Double-check file exists after validation
-            if not file_path.exists():
-                print(f"⚠️  FILE DISAPPEARED: {file_path.name} was removed during validation")
-                return False
-            
-            print(f"📄 PROCESSING: {file_path.name}")
+            self.logger.info(f"📄 PROCESSING: {file_path.name}")
             
-            # Read JSON file with error handling
+            # Read JSON file - the open itself is the existence check (one syscall, no TOCTOU gap)
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                if buf is None:
+                    buf = _read_unless_ocr(file_path)
+                    if buf is None:
+                        self.move_raw_ocr_file(file_path)
+                        return False
             except FileNotFoundError:
-                print(f"   ⚠️  FILE NOT FOUND: {file_path.name} was removed while reading")
+                self.logger.warning(f"   ⚠️  FILE MISSING: {file_path.name} no longer exists (already processed)")
+                return False
+            except Exception as e:
+                self.logger.error(f"   ❌ READ ERROR: Could not read {file_path.name}: {e}")
+                return False
+            
+            # Cheap byte scans reject OCR and already converted files without a full parse
+            if self.screen_raw_json(buf, file_path):
                 return False
+            
+            try:
+                data = _loads_json(buf)
             except Exception as e:
-                print(f"   ❌ READ ERROR: Could not read {file_path.name}: {e}")
+                self.logger.error(f"   ❌ READ ERROR: Could not read {file_path.name}: {e}")
                 return False
             
             # ENHANCED VALIDATION & CONVERSION (includes OCR detection and moving)
             validated_data = self.validate_and_convert_format(data, file_path)
             
             if validated_data is None:
-                # File was either moved (OCR) or invalid - check if file still exists
-                if not file_path.exists():
-                    print(f"   ✅ FILE HANDLED: {file_path.name} was moved or processed by validation")
-                return False
-            
-            # CRITICAL: Final existence check before timezone conversion
-            if not file_path.exists():
-                print(f"   ⚠️  FILE REMOVED: {file_path.name} was processed by another worker")
+                # File was either moved (OCR) or invalid
                 return False
             
             # Use the validated/converted data for processing
             data = validated_data
             
             # Process timezone conversion
-            converted_data = self.convert_timezone(data)
+            converted_data, converted_time = self.convert_timezone(data)
             
-            # Determine output date folder using flexible time extraction
-            print_time_str = self.extract_time_field(converted_data)
-            if print_time_str and print_time_str.lower() != 'unknown':
-                try:
-                    # Try multiple time formats
-                    time_formats = [
-                        '%Y-%m-%d %H:%M:%S',
-                        '%Y-%m-%d %H:%M:%S.%f',
-                        '%Y-%m-%dT%H:%M:%S',
-                        '%Y-%m-%dT%H:%M:%S.%f',
-                        '%Y-%m-%dT%H:%M:%SZ',
-                        '%Y%m%d_%H%M%S',
-                        '%Y-%m-%d',
-                        '%m/%d/%Y %H:%M:%S',
-                        '%d/%m/%Y %H:%M:%S'
-                    ]
-                    
-                    print_datetime = None
-                    for fmt in time_formats:
-                        try:
-                            print_datetime = datetime.strptime(print_time_str, fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if print_datetime:
-                        date_folder = print_datetime.date().strftime('%Y-%m-%d')
-                    else:
-                        date_folder = datetime.now().strftime('%Y-%m-%d')
-                        
-                except Exception as e:
-                    self.logger.warning(f"Could not parse time '{print_time_str}': {e}")
-                    date_folder = datetime.now().strftime('%Y-%m-%d')
-            else:
-                date_folder = datetime.now().strftime('%Y-%m-%d')
+            # Determine output date folder - reuse the converted time, only re-parse
+            # (with the looser folder layouts) when conversion could not parse it
+            if converted_time is None:
+                print_time_str = self.extract_time_field(converted_data)
+                if print_time_str and print_time_str.lower() != 'unknown':
+                    converted_time = _parse_time(print_time_str, for_folder=True)
+            date_folder = converted_time.strftime('%Y-%m-%d') if converted_time else self._today_str()
             
             # Create output directory
             output_date_dir = self.output_dir / date_folder
-            output_date_dir.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(output_date_dir)
             
             # Create output file path
             output_file = output_date_dir / file_path.name
             
-            # CRITICAL: Final check before file operations
-            if not file_path.exists():
-                print(f"   ⚠️  FILE VANISHED: {file_path.name} disappeared before final processing")
-                return False
-            
             # Write converted JSON
             try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(converted_data, f, indent=2, ensure_ascii=False)
+                _write_file_bytes(output_file, _dumps_json(converted_data))
             except Exception as e:
-                print(f"   ❌ WRITE ERROR: Could not write output file: {e}")
+                if isinstance(e, FileNotFoundError):
+                    self._forget_dir(output_date_dir)
+                self.logger.error(f"   ❌ WRITE ERROR: Could not write output file: {e}")
                 return False
             
             # Remove original file with error handling
             try:
                 file_path.unlink()
-                print(f"   🧹 Removed from source")
+                self.logger.info(f"   🧹 Removed from source")
             except FileNotFoundError:
-                print(f"   ⚠️  SOURCE ALREADY REMOVED: {file_path.name} was already deleted")
+                self.logger.warning(f"   ⚠️  SOURCE ALREADY REMOVED: {file_path.name} was already deleted")
             except Exception as e:
-                print(f"   ⚠️  REMOVAL ERROR: Could not remove source file: {e}")
+                self.logger.warning(f"   ⚠️  REMOVAL ERROR: Could not remove source file: {e}")
             
             # Update stats
-            self.stats['processed'] += 1
+            self._inc_stat('processed')
             
             # Log conversion
-            original_time = self.extract_time_field(data) if 'original_print_time' not in converted_data else data.get('print_time', 'Unknown')
+            original_time = converted_data.get('original_print_time') or self.extract_time_field(converted_data)
             converted_time = converted_data.get('print_time', 'Unknown')
             
-            print(f"✅ CONVERTED: {file_path.name}")
-            print(f"   📍 Source: matched_non_delivery/{file_path.parent.name}")
-            print(f"   🕐 Time: {original_time} → {converted_time}")
-            print(f"   📁 Output: converted_tz/{date_folder}/")
+            self.logger.info(f"✅ CONVERTED: {file_path.name}")
+            self.logger.info(f"   📍 Source: matched_non_delivery/{file_path.parent.name}")
+            self.logger.info(f"   🕐 Time: {original_time} → {converted_time}")
+            self.logger.info(f"   📁 Output: converted_tz/{date_folder}/")
             
             return True
             
         except Exception as e:
             self.logger.error(f"❌ Error processing {file_path.name}: {e}")
-            self.stats['failed'] += 1
+            self._inc_stat('failed')
             return False
     
-    def convert_timezone(self, data: Dict) -> Dict:
-        """Convert timezone from UTC+8 to UTC+0 with flexible time field detection"""
+    def convert_timezone(self, data: Dict) -> Tuple[Dict, Optional[datetime]]:
+        """Convert timezone from UTC+8 to UTC+0 with flexible time field detection
+        
+        Updates data in place. Returns it together with the converted datetime, or None when no time was converted.
+        """
         try:
             print_time_str = self.extract_time_field(data)
             if not print_time_str or str(print_time_str).lower() == 'unknown':
-                return data
+                return data, None
             
             # Try to parse datetime with multiple formats
-            time_formats = [
-                '%Y-%m-%d %H:%M:%S',
-                '%Y-%m-%d %H:%M:%S.%f',
-                '%Y-%m-%dT%H:%M:%S',
-                '%Y-%m-%dT%H:%M:%S.%f',
-                '%Y-%m-%dT%H:%M:%SZ',
-                '%Y%m%d_%H%M%S'
-            ]
-            
-            original_time = None
-            for fmt in time_formats:
-                try:
-                    original_time = datetime.strptime(print_time_str, fmt)
-                    break
-                except ValueError:
-                    continue
+            original_time = _parse_time(print_time_str)
             
             if not original_time:
                 self.logger.warning(f"Could not parse time format: {print_time_str}")
-                return data
+                return data, None
             
             # Convert from UTC+8 to UTC+0 (subtract 8 hours)
             converted_time = original_time - timedelta(hours=8)
             
-            # Update data
-            data_copy = data.copy()
-            data_copy['print_time'] = converted_time.strftime('%Y-%m-%d %H:%M:%S')
-            data_copy['original_print_time'] = print_time_str
-            data_copy['timezone_conversion'] = "UTC+8 -> UTC+0"
+            # Update data in place - the dict is owned by this call chain (see validate_and_convert_format)
+            data['print_time'] = converted_time.strftime('%Y-%m-%d %H:%M:%S')
+            data['original_print_time'] = print_time_str
+            data['timezone_conversion'] = "UTC+8 -> UTC+0"
             
-            return data_copy
+            return data, converted_time
             
         except Exception as e:
             self.logger.error(f"Error converting timezone: {e}")
-            return data
+            return data, None
     
     def process_existing_files(self) -> int:
         """Process all existing files in matched_non_delivery"""
@@ -525,7 +756,7 @@ class FocusedTimezoneWorker:
             return 0
         
         # Get all JSON files recursively
-        json_files = list(self.watch_dir.rglob("*.json"))
+        json_files = list(_scan_json_files(str(self.watch_dir)))
         
         if not json_files:
             print("📭 No existing files to process")
@@ -535,18 +766,37 @@ class FocusedTimezoneWorker:
         
         # Show which date folders contain files
         date_folders = set()
-        for file_path in json_files:
-            if file_path.parent.name.count('-') == 2:  # YYYY-MM-DD format
-                date_folders.add(file_path.parent.name)
+        for path in json_files:
+            parent_name = os.path.basename(os.path.dirname(path))
+            if parent_name.count('-') == 2:  # YYYY-MM-DD format
+                date_folders.add(parent_name)
         
         if date_folders:
             print(f"📅 Date folders with files: {', '.join(sorted(date_folders))}")
         
         processed_count = 0
-        for i, file_path in enumerate(json_files, 1):
-            print(f"\n📄 [{i}/{len(json_files)}] Processing: {file_path.name}")
-            if self.process_matched_file(file_path):
-                processed_count += 1
+        for start in range(0, len(json_files), IO_BATCH_SIZE):
+            batch = json_files[start:start + IO_BATCH_SIZE]
+            
+            # Prefetch the whole batch first so reads run back-to-back - through the same OCR screen
+            # as the realtime path, so large OCR blobs are never copied into memory
+            tasks = []
+            for path in batch:
+                file_path = Path(path)
+                try:
+                    buf = _read_unless_ocr(path)
+                except OSError:
+                    tasks.append((self.process_matched_file, file_path, None))  # Let it report the error
+                    continue
+                if buf is None:
+                    tasks.append((self.move_raw_ocr_file, file_path))
+                else:
+                    tasks.append((self.process_matched_file, file_path, buf))
+            
+            print(f"\n📄 [{start + 1}-{start + len(batch)}/{len(json_files)}] Processing batch...")
+            futures = [self._pool.submit(*task) for task in tasks]
+            wait(futures)
+            processed_count += sum(1 for f in futures if f.result())
         
         print(f"\n✅ Processed {processed_count} existing files")
         return processed_count
@@ -560,10 +810,14 @@ class FocusedTimezoneWorker:
         print("🚀 Starting focused real-time monitoring...")
         self.is_running = True
         
+        # Queue -> pool dispatcher
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="tz-dispatcher", daemon=True)
+        self._dispatcher.start()
+        
         # Setup file system observer
         handler = FocusedTimezoneHandler(self)
         self.observer = Observer()
-        self.observer.schedule(handler, str(self.watch_dir), recursive=True)
+        self.observer.schedule(handler, str(self.watch_dir), recursive=True, event_filter=WATCH_EVENT_FILTER)
         
         try:
             self.observer.start()
@@ -574,8 +828,9 @@ class FocusedTimezoneWorker:
             return
     
     def stop_monitoring(self):
-        """Stop monitoring"""
+        """Stop monitoring and let in-flight files finish"""
         if not self.is_running:
+            self._pool.shutdown(wait=True)
             return
         
         print("🛑 Stopping monitoring...")
@@ -588,10 +843,14 @@ class FocusedTimezoneWorker:
                 print("✅ Monitoring stopped")
             except Exception as e:
                 self.logger.error(f"Error stopping observer: {e}")
+        
+        if self._dispatcher:
+            self._dispatcher.join(timeout=5)
+        self._pool.shutdown(wait=True)
     
     def print_stats(self):
         """Print current statistics"""
-        elapsed = datetime.now() - self.stats['start_time']
+        elapsed = datetime.now() - self.start_time
         elapsed_minutes = elapsed.total_seconds() / 60
         
         print(f"\n📊 FOCUSED TIMEZONE WORKER STATS:")